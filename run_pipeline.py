@@ -22,13 +22,18 @@ STEPS = {
     "clean": ("Nettoyage BTB", "src.structuration.clean_btb", "main"),
 }
 
-# Steps that must be explicitly requested (one-shot DB extraction)
+# Steps that must be explicitly requested
 EXTRA_STEPS = {
     "extract_archemed": (
         "Extraction BDD ARCHEMED",
         "src.extraction.db_archemed",
         "main",
     ),
+    "filter_archemed": (
+        "Filtrage BTB ARCHEMED",
+        "src.extraction.filter_btb",
+        "main_archemed",
+    ),
     "clean_lba": ("Nettoyage LBA", "src.structuration.clean_lba", "main"),
 }
 
@@ -24,22 +24,67 @@ def _env(key: str, default: str = "") -> str:
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
 # -- Data directories ----------------------------------------------------------
-DATA_DIR = PROJECT_ROOT / "data"
+DATA_DIR = Path(_env("DATA_DIR", str(PROJECT_ROOT / "data")))
 EXTRACT_ALL_DIR = DATA_DIR / "extract_all"
 EXTRACT_FILTERED_BTB_DIR = DATA_DIR / "extract_filter_btb"
 EXTRACT_BTB_TXT_DIR = DATA_DIR / "extract_btb_txt"
 EXTRACT_ARCHEMED_DIR = DATA_DIR / "EDS_archemed_extract"
 EXTRACT_FILTERED_BTB_DIR_ARCHEMED = DATA_DIR / "extract_filtrer_btb_archemed"
+# Unique downloaded documents, named by content hash, and source ID mapping
+DOCUMENT_STORE_DIR = DATA_DIR / "document_store"
+
+# -- Filtering -----------------------------------------------------------------
+# Write matching documents as text during filtering (skips pdf_to_text)
+FILTER_FUSED = _env("FILTER_FUSED", "0") == "1"
+# How kept PDFs reach EXTRACT_FILTERED_BTB_DIR: copy, hardlink, symlink, manifest
+FILTER_OUTPUT_MODE = _env("FILTER_OUTPUT_MODE", "copy")
+# Number of processes used for keyword checks
+FILTER_WORKERS = int(_env("FILTER_WORKERS", "1"))
+
+# -- Easily extraction ---------------------------------------------------------
+# Rows fetched per round trip (each row carries a PDF)
+EASILY_FETCH_SIZE = int(_env("EASILY_FETCH_SIZE", "50"))
+# Threads writing PDFs to disk while the next rows are fetched
+EASILY_WRITERS = int(_env("EASILY_WRITERS", "4"))
+# Maximum size of fetched PDFs waiting to be written
+EASILY_BUFFER_MB = int(_env("EASILY_BUFFER_MB", "256"))
+# IPP batches queried at once, one connection each
+EASILY_CONNECTIONS = int(_env("EASILY_CONNECTIONS", "1"))
+# Retries of a batch after a transient database error
+EASILY_RETRIES = int(_env("EASILY_RETRIES", "3"))
+# "batches": IN lists of 450 IPPs, "temp_table": one join on a temp table
+EASILY_QUERY_MODE = _env("EASILY_QUERY_MODE", "batches")
+
+# -- ARCHEMED extraction -------------------------------------------------------
+# Rows fetched per round trip by the server-side cursor
+ARCHEMED_ITERSIZE = int(_env("ARCHEMED_ITERSIZE", "500"))
+# Number of processes converting HTML to text
+ARCHEMED_WORKERS = int(_env("ARCHEMED_WORKERS", "1"))
+# Only fetch documents whose HTML may contain a BTB inclusion keyword
+ARCHEMED_SQL_PREFILTER = _env("ARCHEMED_SQL_PREFILTER", "0") == "1"
+# "bs4": BeautifulSoup, "fast": streaming tag stripper (same text, no tree)
+ARCHEMED_HTML_PARSER = _env("ARCHEMED_HTML_PARSER", "bs4")
 
 # -- Output directory ----------------------------------------------------------
 OUTPUT_DIR = PROJECT_ROOT / "src" / "output"
 
 # -- Reference data ------------------------------------------------------------
-TRANSPLANTS_CSV = PROJECT_ROOT / "src" / "extraction" / "transplants.csv"
+TRANSPLANTS_CSV = Path(
+    _env(
+        "TRANSPLANTS_CSV",
+        str(PROJECT_ROOT / "src" / "extraction" / "transplants.csv"),
+    )
+)
 
 # -- Java / JAR ----------------------------------------------------------------
 JAR_PATH = PROJECT_ROOT / "src" / "extraction" / "pdftotext-jar-with-dependencies.jar"
 JAVA_PATH = _env("JAVA_PATH", r"C:\Program Files\Java\jdk-21.0.5\bin\java.exe")
+# "jar": external Java converter, "pymupdf": in-process extraction (no JVM)
+PDF_TO_TEXT_BACKEND = _env("PDF_TO_TEXT_BACKEND", "jar")
+# "spawn": one JVM per PDF, "persistent": long-lived JVM fed over stdin
+PDF_TO_TEXT_MODE = _env("PDF_TO_TEXT_MODE", "spawn")
+PDF_TO_TEXT_SERVER = PROJECT_ROOT / "src" / "extraction" / "PdfToTextServer.java"
+PDF_TO_TEXT_WORKERS = int(_env("PDF_TO_TEXT_WORKERS", "1"))
 
 # -- Database credentials (from environment) -----------------------------------
 EASILY_DB = {
@@ -65,3 +110,9 @@ PG_DB = {
     "user": _env("PG_USERNAME"),
     "password": _env("PG_PASSWORD"),
 }
+
+# -- Database backend ----------------------------------------------------------
+# "server": hospital databases, "sqlite": local synthetic copy (benchmarking)
+DB_BACKEND = _env("DB_BACKEND", "server")
+# SQLite file used by the "sqlite" backend (see src.extraction.seed_benchmark)
+DB_SQLITE_PATH = Path(_env("DB_SQLITE_PATH", str(DATA_DIR / "benchmark.sqlite")))
@@ -0,0 +1,89 @@
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.util.jar.JarFile;
+
+/**
+ * Long-lived wrapper around pdftotext-jar-with-dependencies.jar.
+ *
+ * Loads the JAR's Main-Class once, then reads one PDF path per line on stdin
+ * and answers one line per path on stdout:
+ *
+ *     READY                       (once, after startup)
+ *     OK\t{path}
+ *     ERR\t{path}\t{message}
+ *     EXIT\t{path}                (the JVM is shutting down during {path})
+ *
+ * Anything the converter prints itself is redirected to stderr so that it
+ * cannot corrupt the protocol. System.exit() cannot be intercepted on current
+ * JDKs (no Security Manager), so a converter calling it ends this process: a
+ * shutdown hook reports it with an EXIT line instead of a silent EOF. Text files are written by the converter in the
+ * working directory of this process, exactly as with "java -jar".
+ *
+ * Usage (single-file source launch, JDK 11+):
+ *     java PdfToTextServer.java pdftotext-jar-with-dependencies.jar
+ */
+public class PdfToTextServer {
+
+    /** Path being converted, null between documents. */
+    private static volatile String current;
+
+    public static void main(String[] args) throws Exception {
+        File jar = new File(args[0]);
+        String mainClassName;
+        try (JarFile jarFile = new JarFile(jar)) {
+            mainClassName = jarFile.getManifest().getMainAttributes().getValue("Main-Class");
+        }
+        // Redirect System.out before the converter classes are initialised,
+        // in case they keep a reference to it.
+        PrintStream protocol = new PrintStream(
+                new FileOutputStream(FileDescriptor.out), true, StandardCharsets.UTF_8);
+        System.setOut(System.err);
+        Runtime.getRuntime().addShutdownHook(new Thread(() -> {
+            String path = current;
+            if (path != null) {
+                protocol.println("EXIT\t" + path);
+            }
+        }));
+
+        URLClassLoader loader = new URLClassLoader(
+                new URL[] {jar.toURI().toURL()}, PdfToTextServer.class.getClassLoader());
+        Method entryPoint = Class.forName(mainClassName, true, loader)
+                .getMethod("main", String[].class);
+
+        BufferedReader in = new BufferedReader(
+                new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        protocol.println("READY");
+
+        String path;
+        while ((path = in.readLine()) != null) {
+            if (path.isEmpty()) {
+                continue;
+            }
+            current = path;
+            try {
+                entryPoint.invoke(null, (Object) new String[] {path});
+                protocol.println("OK\t" + path);
+            } catch (InvocationTargetException e) {
+                protocol.println("ERR\t" + path + "\t" + describe(e.getCause()));
+            } catch (Throwable e) {
+                protocol.println("ERR\t" + path + "\t" + describe(e));
+            } finally {
+                current = null;
+            }
+        }
+    }
+
+    private static String describe(Throwable e) {
+        String message = e == null ? "unknown error" : e.toString();
+        return message.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ');
+    }
+}
@@ -0,0 +1,119 @@
+"""Persistent state of the ARCHEMED extraction, used for incremental runs.
+
+Every written document is recorded with its source identifiers and the hash
+of its text, so that a document fetched again with the same content is not
+rewritten. The high-water mark (latest document_date of the last complete
+run) is only advanced when a run finishes, so an interrupted run is simply
+queried again from the previous mark.
+"""
+
+import hashlib
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path          TEXT PRIMARY KEY,
+    origin_code   TEXT NOT NULL,
+    document_date TEXT,
+    sha256        TEXT NOT NULL,
+    saved_at      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_date ON documents (document_date);
+CREATE TABLE IF NOT EXISTS runs (
+    finished_at   TEXT NOT NULL,
+    mode          TEXT NOT NULL,
+    watermark     TEXT,
+    fetched       INTEGER NOT NULL,
+    written       INTEGER NOT NULL
+);
+"""
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def date_key(document_date) -> str | None:
+    """Sortable text form of a document_date (None stays None)."""
+    return document_date.isoformat() if document_date else None
+
+
+class ArchemedState:
+    """SQLite record of extracted ARCHEMED documents and of the watermark."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def watermark(self, mode: str) -> str | None:
+        """document_date mark of the last complete run in mode, None before any.
+
+        mode names the set of documents queried (e.g. with or without the
+        server-side pre-filter): a mark only holds for the same set.
+        """
+        row = self.conn.execute(
+            "SELECT watermark FROM runs WHERE mode = ? ORDER BY rowid DESC LIMIT 1",
+            (mode,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def known_at(self, watermark: str | None) -> list[str]:
+        """Origin codes already saved at the watermark date or without date.
+
+        Those are the only rows at or before the mark that a new run fetches,
+        so they are excluded by the incremental query.
+        """
+        rows = self.conn.execute(
+            "SELECT DISTINCT origin_code FROM documents "
+            "WHERE document_date IS NULL OR document_date = ?",
+            (watermark,),
+        )
+        return [row[0] for row in rows]
+
+    def hashes(self) -> dict:
+        """Map path -> sha256 of every recorded document."""
+        return dict(self.conn.execute("SELECT path, sha256 FROM documents"))
+
+    def record(self, path: str, origin_code: str, document_date, sha256: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+            (
+                path,
+                origin_code,
+                date_key(document_date),
+                sha256,
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+
+    def finish_run(
+        self, mode: str, watermark: str | None, fetched: int, written: int
+    ):
+        """Store the mark reached by a complete run."""
+        self.conn.execute(
+            "INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+            (
+                datetime.now().isoformat(timespec="seconds"),
+                mode,
+                watermark,
+                fetched,
+                written,
+            ),
+        )
+        self.conn.commit()
+
+    def commit(self):
+        self.conn.commit()
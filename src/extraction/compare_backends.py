@@ -0,0 +1,158 @@
+"""Compare the JAR and PyMuPDF pdf_to_text backends on a sample of PDFs.
+
+Both backends convert the same sample, extract_btb is run on each output,
+and the extracted fields are compared document by document. The report is
+written to OUTPUT_DIR/pdf_backend_comparison.xlsx:
+    summary     -- per field: documents compared, identical, whitespace-only
+                   differences, real differences
+    differences -- one row per (file, field) that differs
+
+Usage:
+    python -m src.extraction.compare_backends [--sample 200] [--seed 0]
+"""
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import tempfile
+
+import pandas as pd
+
+from src.config import EXTRACT_FILTERED_BTB_DIR, OUTPUT_DIR
+from src.extraction import pdf_to_text
+from src.structuration.extract_btb import process_text_files
+
+log = logging.getLogger(__name__)
+
+
+def _normalize(value) -> str | None:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+def compare_frames(jar_df: pd.DataFrame, pymupdf_df: pd.DataFrame):
+    """Compare two extract_btb outputs field by field, matched on Filename."""
+    jar = jar_df.set_index("Filename")
+    native = pymupdf_df.set_index("Filename")
+    common = jar.index.intersection(native.index)
+    fields = [c for c in jar.columns if c in native.columns]
+
+    summary = []
+    differences = []
+    for field in fields:
+        identical = whitespace_only = different = 0
+        for filename in common:
+            a = _normalize(jar.at[filename, field])
+            b = _normalize(native.at[filename, field])
+            if a == b:
+                identical += 1
+                continue
+            if a is not None and b is not None and a.split() == b.split():
+                whitespace_only += 1
+                kind = "whitespace"
+            else:
+                different += 1
+                kind = "value"
+            differences.append(
+                {
+                    "Filename": filename,
+                    "Field": field,
+                    "Kind": kind,
+                    "jar": a,
+                    "pymupdf": b,
+                }
+            )
+        summary.append(
+            {
+                "Field": field,
+                "Compared": len(common),
+                "Identical": identical,
+                "Whitespace only": whitespace_only,
+                "Different": different,
+            }
+        )
+
+    return pd.DataFrame(summary), pd.DataFrame(
+        differences, columns=["Filename", "Field", "Kind", "jar", "pymupdf"]
+    )
+
+
+def main(
+    source_dir: str | None = None,
+    sample_size: int = 200,
+    seed: int = 0,
+):
+    """Run both backends on a sample and write the comparison report."""
+    source = source_dir or str(EXTRACT_FILTERED_BTB_DIR)
+    pdf_files = pdf_to_text.list_input_pdfs(source)
+    if not pdf_files:
+        raise FileNotFoundError(f"No PDF files in {source}")
+
+    sample_size = min(sample_size, len(pdf_files))
+    sample = sorted(random.Random(seed).sample(pdf_files, sample_size))
+    log.info("Comparing backends on %d of %d PDFs", len(sample), len(pdf_files))
+
+    with tempfile.TemporaryDirectory(prefix="compare_backends_") as tmp:
+        sample_dir = os.path.join(tmp, "pdf")
+        os.makedirs(sample_dir)
+        for pdf_path in sample:
+            shutil.copy(pdf_path, sample_dir)
+
+        frames = {}
+        for backend in pdf_to_text.BACKENDS:
+            txt_dir = os.path.join(tmp, backend)
+            pdf_to_text.main(sample_dir, txt_dir, backend=backend)
+            frames[backend] = process_text_files(txt_dir)
+
+    for backend, df in frames.items():
+        if df.empty:
+            raise RuntimeError(f"Backend '{backend}' produced no extractable text")
+
+    only_jar = set(frames["jar"]["Filename"]) - set(frames["pymupdf"]["Filename"])
+    only_native = set(frames["pymupdf"]["Filename"]) - set(frames["jar"]["Filename"])
+    if only_jar or only_native:
+        log.warning(
+            "Converted by one backend only: %d jar, %d pymupdf",
+            len(only_jar),
+            len(only_native),
+        )
+
+    summary, differences = compare_frames(frames["jar"], frames["pymupdf"])
+
+    os.makedirs(str(OUTPUT_DIR), exist_ok=True)
+    output_file = OUTPUT_DIR / "pdf_backend_comparison.xlsx"
+    with pd.ExcelWriter(str(output_file)) as writer:
+        summary.to_excel(writer, sheet_name="summary", index=False)
+        differences.to_excel(writer, sheet_name="differences", index=False)
+
+    for row in summary.to_dict("records"):
+        if row["Different"] or row["Whitespace only"]:
+            log.info(
+                "%-45s %4d different, %4d whitespace only",
+                row["Field"][:45],
+                row["Different"],
+                row["Whitespace only"],
+            )
+    log.info(
+        "Comparison done: %d field differences (%d whitespace only) -> %s",
+        len(differences),
+        int(summary["Whitespace only"].sum()),
+        output_file,
+    )
+    return summary, differences
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Compare pdf_to_text backends.")
+    parser.add_argument("--source", default=None, help="Directory of PDF files")
+    parser.add_argument("--sample", type=int, default=200, help="Sample size")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed")
+    args = parser.parse_args()
+    main(args.source, args.sample, args.seed)
@@ -1,20 +1,75 @@
 """Extract anapath documents from PostgreSQL (DWH ARCHEMED).
 
+Rows are streamed with a server-side cursor (ARCHEMED_ITERSIZE rows per
+fetch) and written as they arrive, instead of loading the whole result.
+
+HTML is converted to text on a process pool (--workers / ARCHEMED_WORKERS).
+The "fast" parser (--parser / ARCHEMED_HTML_PARSER) is a streaming tag
+stripper giving the same text as BeautifulSoup's get_text() without building
+a tree; --check-parser N compares both on the first N documents.
+
+Runs are incremental: the state file (archemed_state.sqlite, in
+EXTRACT_ARCHEMED_DIR) keeps the document_date watermark of the last complete
+run and the hash of every written text. Only rows past the watermark are
+queried and unchanged texts are not rewritten; --full queries everything
+again (e.g. to pick up documents loaded late with an old date).
+
+Texts go through the document store (DOCUMENT_STORE_DIR), keyed by their
+path: a text identical to one already saved under another path is only
+mapped to its hash, not written, so later steps handle each report once.
+
+With --prefilter (ARCHEMED_SQL_PREFILTER=1), the BTB inclusion keywords are
+sent to the server as a case- and accent-insensitive regex on the raw HTML,
+so only candidate BTB documents are transferred and parsed. The regex is
+loose (character references are accepted for any letter): it never drops a
+document that filter_btb --archemed would keep. Exclusion keywords are not
+pushed down, as a match in markup (comment, attribute) would wrongly drop a
+document; filter_btb --archemed still applies them.
+
 Usage:
-    python -m src.extraction.db_archemed
+    python -m src.extraction.db_archemed [--itersize 500] [--workers N]
+                                         [--parser bs4|fast] [--check-parser N]
+                                         [--full] [--prefilter]
 """
 
+import argparse
+import html.entities
 import logging
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from html.parser import HTMLParser
+from itertools import islice
 
-import psycopg2
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 
-from src.config import PG_DB, EXTRACT_ARCHEMED_DIR
+from src.config import (
+    ARCHEMED_HTML_PARSER,
+    ARCHEMED_ITERSIZE,
+    ARCHEMED_SQL_PREFILTER,
+    ARCHEMED_WORKERS,
+    EXTRACT_ARCHEMED_DIR,
+    DOCUMENT_STORE_DIR,
+)
+from src.extraction import db_backend
+from src.extraction.archemed_state import ArchemedState, date_key, sha256_text
+from src.extraction.document_store import DocumentStore
+from src.extraction.filter_btb import (
+    INCLUSION_KEYWORDS,
+    keyword_sql_regex,
+    strip_accents,
+)
+from src.extraction.parallel import ordered_map, prefetch
 
 log = logging.getLogger(__name__)
 
+HTML_PARSERS = ("bs4", "fast")
+
+# Rows sent to a worker process at once
+CONVERT_BATCH_SIZE = 32
+
 QUERY = """
 SELECT DISTINCT ON (d.patient_num, d.document_origin_code)
     d.patient_num,
@@ -29,64 +84,378 @@ WHERE d.document_type = 'EXT'
 AND d.title LIKE '%%Anapath%%'
 """
 
+# Incremental runs: rows past the watermark, plus rows at the watermark date
+# (or without date) that were not saved yet
+INCREMENTAL_FILTER = """
+AND (
+    d.document_date > %(since)s
+    OR (
+        (d.document_date = %(since)s OR d.document_date IS NULL)
+        AND NOT d.document_origin_code::text = ANY(%(known)s)
+    )
+)
+"""
+
+# Server-side BTB pre-filter: only documents that may contain an inclusion
+# keyword are sent (exclusions are left to filter_btb --archemed)
+PREFILTER = """
+AND d.displayed_text ~* %(inclusion)s
+"""
+
+STATE_NAME = "archemed_state.sqlite"
+STORE_SOURCE = "archemed"
+STATE_COMMIT_EVERY = 500
+
+
+# Tags whose strings BeautifulSoup leaves out of get_text() (string containers)
+HIDDEN_TEXT_TAGS = frozenset({"rt", "rp", "script", "style", "template"})
+
+# Void elements: BeautifulSoup closes them at once and ignores a later </tag>
+VOID_TAGS = frozenset(
+    {
+        "area", "base", "basefont", "bgsound", "br", "col", "command", "embed",
+        "frame", "hr", "image", "img", "input", "isindex", "keygen", "link",
+        "menuitem", "meta", "nextid", "param", "source", "spacer", "track", "wbr",
+    }
+)  # fmt: skip
+
+# Numeric references to C1 controls are read as Windows-1252, like BeautifulSoup
+WINDOWS_1252_CONTROLS = {}
+for _code in range(0x80, 0xA0):
+    try:
+        WINDOWS_1252_CONTROLS[_code] = bytes([_code]).decode("cp1252")
+    except UnicodeDecodeError:
+        pass
+
+ENTITIES = {name.rstrip(";"): char for name, char in html.entities.html5.items()}
+
+
+class TextExtractor(HTMLParser):
+    """Streaming equivalent of BeautifulSoup(html, "html.parser").get_text().
+
+    Uses the same tokenizer as BeautifulSoup's html.parser builder and the
+    same rules for joining, skipping and decoding strings, but builds no
+    tree: only the names of the open tags are kept. Call text() after
+    feed() and close().
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.strings = []
+        self._data = []
+        self._open = []
+        self._closed_void = []
+
+    def _flush(self):
+        if not self._data:
+            return
+        data = "".join(self._data).strip()
+        self._data = []
+        if data and not HIDDEN_TEXT_TAGS.intersection(self._open):
+            self.strings.append(data)
+
+    def text(self, separator: str = "\n") -> str:
+        self._flush()
+        return separator.join(self.strings)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in VOID_TAGS:
+            self._closed_void.append(tag)
+        else:
+            self._open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void:
+            self._closed_void.remove(tag)
+            return
+        self._flush()
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i] == tag:
+                del self._open[i:]
+                break
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_charref(self, name):
+        try:
+            code = int(name[1:], 16) if name[:1] in "xX" else int(name)
+        except ValueError:
+            self._data.append(name)
+            return
+        if code == 0 or code > 0x10FFFF or 0xD800 <= code <= 0xDFFF:
+            self._data.append("\ufffd")
+        else:
+            self._data.append(WINDOWS_1252_CONTROLS.get(code) or chr(code))
+
+    def handle_entityref(self, name):
+        self._data.append(ENTITIES.get(name, f"&{name}"))
+
+    def _skip(self, data):
+        self._flush()
+
+    handle_comment = handle_decl = handle_pi = _skip
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            # CDATA sections are kept, even inside hidden tags
+            data = data[len("CDATA[") :].strip()
+            if data:
+                self.strings.append(data)
+
+
+def html_to_text(html_content: str, parser: str = "bs4") -> str:
+    """Extract plain text from HTML content.
 
-def html_to_text(html_content: str) -> str:
-    """Extract plain text from HTML content."""
+    parser "fast" gives the same result as "bs4" without building a tree.
+    """
     if not html_content:
         return ""
+    if parser == "fast":
+        extractor = TextExtractor()
+        extractor.feed(html_content)
+        extractor.close()
+        return extractor.text()
     soup = BeautifulSoup(html_content, "html.parser")
     return soup.get_text(separator="\n", strip=True)
 
 
-def main():
-    """Connect to ARCHEMED PostgreSQL and extract anapath documents as text."""
-    os.makedirs(str(EXTRACT_ARCHEMED_DIR), exist_ok=True)
+def convert_rows(rows: list, parser: str) -> list:
+    """Convert a batch of rows to (hospital_ipp, origin_code, date, text).
 
-    log.info(
-        "Connecting to PostgreSQL (%s:%s/%s)...",
-        PG_DB["host"],
-        PG_DB["port"],
-        PG_DB["database"],
-    )
-    conn = psycopg2.connect(**PG_DB)
+    text is None for documents without content. Runs in worker processes.
+    """
+    return [
+        (
+            str(row[1]),
+            str(row[2]),
+            row[4],
+            html_to_text(row[5], parser) if row[5] else None,
+        )
+        for row in rows
+    ]
+
+
+def batched(items, size: int):
+    """Yield lists of up to size consecutive items."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def prefilter_regex() -> str:
+    """PostgreSQL regex matching the HTML of any candidate BTB document.
+
+    Keywords containing a shorter keyword are left out: the shorter one
+    already matches them.
+    """
+    folded = {strip_accents(k).lower(): k for k in INCLUSION_KEYWORDS}
+    keywords = [
+        keyword
+        for key, keyword in folded.items()
+        if not any(other != key and other in key for other in folded)
+    ]
+    return "|".join(keyword_sql_regex(keyword) for keyword in keywords)
+
+
+def document_path(hospital_ipp: str, origin_code: str, document_date) -> str:
+    """Path of a document, relative to EXTRACT_ARCHEMED_DIR."""
+    date_str = document_date.strftime("%Y%m%d") if document_date else "nodate"
+    return os.path.join(hospital_ipp, f"{hospital_ipp}_{date_str}_{origin_code}.txt")
+
+
+def save_document(store, path: str, text: str) -> bool:
+    """Store one document and write it as text in its patient folder.
+
+    Returns False, without writing, when the same text is already saved
+    under another path (only the mapping is recorded).
+    """
+    filename = EXTRACT_ARCHEMED_DIR / path
+    data = text.replace("\n", os.linesep).encode("utf-8")
+    os.makedirs(str(filename.parent), exist_ok=True)
+    owner = store.add(STORE_SOURCE, path, data, ".txt", str(filename))
+    if owner[1] != path:
+        # A copy written before the content became a duplicate is stale
+        if filename.exists():
+            filename.unlink()
+        log.info("%s not written: same text as %s", path, owner[1])
+        return False
+    return True
+
+
+def iter_documents(rows, parser: str, workers: int):
+    """Yield converted documents in row order, parsing HTML on workers."""
+    batches = batched(rows, CONVERT_BATCH_SIZE)
+    convert = partial(convert_rows, parser=parser)
+    if workers <= 1:
+        for batch in batches:
+            yield from convert(batch)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for _, documents in ordered_map(executor, convert, batches, 2 * workers):
+            yield from documents
+
+
+def connect():
+    log.info("Connecting to %s...", db_backend.describe("archemed"))
+    conn = db_backend.connect("archemed")
     log.info("Connected")
+    return conn
 
-    cursor = conn.cursor()
-    log.info("Executing query...")
-    cursor.execute(QUERY)
 
-    rows = cursor.fetchall()
-    log.info("%d documents found", len(rows))
+def main(
+    itersize: int | None = None,
+    workers: int | None = None,
+    parser: str | None = None,
+    full: bool = False,
+    prefilter: bool | None = None,
+):
+    """Connect to ARCHEMED PostgreSQL and extract anapath documents as text.
 
-    saved = 0
-    skipped = 0
+    Rows are streamed from a server-side cursor, itersize rows per round trip,
+    and fetched in a background thread while earlier rows are parsed (on
+    workers processes) and written, so memory stays bounded whatever the
+    size of the result.
 
-    for row in tqdm(rows, desc="Extracting texts"):
-        hospital_ipp = str(row[1])
-        origin_code = str(row[2])
-        document_date = row[4]
-        displayed_text = row[5]
+    Only rows past the watermark of the last complete run are queried, unless
+    full is True; a document whose text is unchanged is not rewritten.
 
-        if displayed_text:
-            clean_text = html_to_text(displayed_text)
+    With prefilter, the server only returns documents whose HTML may contain
+    a BTB inclusion keyword. Each mode keeps its own watermark.
+    """
+    itersize = max(1, itersize or ARCHEMED_ITERSIZE)
+    workers = max(1, workers or ARCHEMED_WORKERS)
+    parser = parser or ARCHEMED_HTML_PARSER
+    prefilter = ARCHEMED_SQL_PREFILTER if prefilter is None else prefilter
+    mode = "prefilter" if prefilter else "all"
+    if parser not in HTML_PARSERS:
+        raise ValueError(
+            f"Invalid HTML parser '{parser}'. "
+            f"Choose one of {', '.join(HTML_PARSERS)}."
+        )
+    os.makedirs(str(EXTRACT_ARCHEMED_DIR), exist_ok=True)
 
-            patient_folder = EXTRACT_ARCHEMED_DIR / hospital_ipp
-            os.makedirs(str(patient_folder), exist_ok=True)
+    state = ArchemedState(str(EXTRACT_ARCHEMED_DIR / STATE_NAME))
+    since = None if full else state.watermark(mode)
+    query, params = QUERY, {}
+    if since is None:
+        log.info("Full extraction (%s documents)", mode)
+    else:
+        query += INCREMENTAL_FILTER
+        params.update(since=since, known=state.known_at(since))
+        log.info("Incremental extraction (%s documents) from %s", mode, since)
+    if prefilter:
+        query += PREFILTER
+        params["inclusion"] = prefilter_regex()
+    hashes = state.hashes()
+    store = DocumentStore(str(DOCUMENT_STORE_DIR))
 
-            date_str = (
-                document_date.strftime("%Y%m%d") if document_date else "nodate"
-            )
-            filename = patient_folder / f"{hospital_ipp}_{date_str}_{origin_code}.txt"
+    conn = connect()
+    fetched = saved = unchanged = duplicates = skipped = 0
+    watermark = since
 
-            with open(str(filename), "w", encoding="utf-8") as f:
-                f.write(clean_text)
-            saved += 1
-        else:
-            skipped += 1
+    try:
+        # Named cursor: the result set stays on the server
+        cursor = conn.cursor(name="archemed_documents")
+        cursor.itersize = itersize
+        log.info(
+            "Executing query (%d rows per fetch, %s parser, %d worker(s))...",
+            itersize,
+            parser,
+            workers,
+        )
+        cursor.execute(query, params or None)
+
+        rows = prefetch(cursor, max_pending=itersize)
+        documents = iter_documents(rows, parser, workers)
+        for hospital_ipp, origin_code, document_date, text in tqdm(
+            documents, desc="Extracting texts", unit="doc"
+        ):
+            fetched += 1
+            if fetched % STATE_COMMIT_EVERY == 0:
+                state.commit()
+            date = date_key(document_date)
+            if date and (watermark is None or date > watermark):
+                watermark = date
+            if text is None:
+                skipped += 1
+                continue
+            path = document_path(hospital_ipp, origin_code, document_date)
+            sha256 = sha256_text(text)
+            if hashes.get(path) == sha256 and (EXTRACT_ARCHEMED_DIR / path).exists():
+                unchanged += 1
+                continue
+            state.record(path, origin_code, document_date, sha256)
+            if save_document(store, path, text):
+                saved += 1
+            else:
+                duplicates += 1
+
+        cursor.close()
+        state.finish_run(mode, watermark, fetched, saved)
+    finally:
+        # Each close runs even if the previous one failed, so that the state
+        # and the store still commit what was written
+        try:
+            conn.close()
+        finally:
+            try:
+                state.close()
+            finally:
+                store.close()
+    log.info(
+        "Done: %d saved, %d unchanged, %d duplicates, %d skipped (empty text), "
+        "watermark %s",
+        saved,
+        unchanged,
+        duplicates,
+        skipped,
+        watermark,
+    )
 
-    cursor.close()
-    conn.close()
-    log.info("Done: %d saved, %d skipped (empty text)", saved, skipped)
+
+def check_parser(sample_size: int = 500):
+    """Compare the fast parser with BeautifulSoup on the first documents.
+
+    Logs the timing of both parsers and the origin codes of documents whose
+    text differs. Returns the number of differences.
+    """
+    conn = connect()
+    try:
+        cursor = conn.cursor(name="archemed_parser_check")
+        cursor.execute(QUERY)
+        rows = [row for row in cursor.fetchmany(sample_size) if row[5]]
+        cursor.close()
+    finally:
+        conn.close()
+
+    timings = {}
+    results = {}
+    for parser in HTML_PARSERS:
+        start = time.perf_counter()
+        results[parser] = [html_to_text(row[5], parser) for row in rows]
+        timings[parser] = time.perf_counter() - start
+
+    different = [
+        str(row[2])
+        for row, a, b in zip(rows, results["bs4"], results["fast"])
+        if a != b
+    ]
+    log.info(
+        "%d documents: bs4 %.2fs, fast %.2fs, %d different",
+        len(rows),
+        timings["bs4"],
+        timings["fast"],
+        len(different),
+    )
+    for origin_code in different[:20]:
+        log.warning("Different text for document %s", origin_code)
+    return len(different)
 
 
 if __name__ == "__main__":
@@ -94,4 +463,50 @@ if __name__ == "__main__":
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     )
-    main()
+    parser = argparse.ArgumentParser(description="Extract ARCHEMED documents.")
+    parser.add_argument(
+        "--itersize",
+        type=int,
+        default=ARCHEMED_ITERSIZE,
+        help="Rows fetched from the server per round trip",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=ARCHEMED_WORKERS,
+        help="Number of processes converting HTML to text",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=HTML_PARSERS,
+        default=ARCHEMED_HTML_PARSER,
+        help="HTML to text converter (fast: same output, no tree)",
+    )
+    parser.add_argument(
+        "--check-parser",
+        type=int,
+        metavar="N",
+        help="Compare both parsers on the first N documents and exit",
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        default=ARCHEMED_SQL_PREFILTER,
+        help="Only fetch documents that may contain a BTB inclusion keyword",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Query every document, ignoring the watermark of the last run",
+    )
+    args = parser.parse_args()
+    if args.check_parser:
+        check_parser(args.check_parser)
+    else:
+        main(
+            itersize=args.itersize,
+            workers=args.workers,
+            parser=args.parser,
+            full=args.full,
+            prefilter=args.prefilter,
+        )
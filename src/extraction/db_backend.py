@@ -0,0 +1,248 @@
+"""Database adapter used by the extraction steps.
+
+db_easily and db_archemed open their connections here instead of calling the
+drivers directly. With DB_BACKEND=server (the default), connections go to
+the hospital servers: SQL Server through pyodbc for Easily, PostgreSQL
+through psycopg2 for ARCHEMED. With DB_BACKEND=sqlite, both use a local
+SQLite file (DB_SQLITE_PATH, filled by src.extraction.seed_benchmark) with
+the same tables, so the extraction steps can be run, profiled and tuned
+(fetch sizes, writer threads, memory) without network access.
+
+The SQLite connection exposes the parts of the pyodbc and psycopg2 APIs used
+by the extraction steps (context-managed cursors, named cursors with
+itersize, fetchmany, executemany) and rewrites their SQL: three-part and
+schema table names, session temp tables (#name), DISTINCT ON, ANY(array),
+the ~* regex operator and pyformat parameters. The rewriting only covers the
+queries of this package.
+"""
+
+import json
+import logging
+import re
+import sqlite3
+from datetime import date, datetime
+
+from src.config import DB_BACKEND, DB_SQLITE_PATH, EASILY_DB, PG_DB
+
+log = logging.getLogger(__name__)
+
+BACKENDS = ("server", "sqlite")
+DATABASES = ("easily", "archemed")
+
+# Server table names and their SQLite counterparts
+SQLITE_TABLES = {
+    "METADONE.metadone.DOCUMENTS": "metadone_documents",
+    "NOYAU.patient.PATIENT": "noyau_patient",
+    "STOCKAGE.stockage.FILES": "stockage_files",
+    "dwh.dwh_document": "dwh_document",
+    "dwh.dwh_patient_ipphist": "dwh_patient_ipphist",
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS noyau_patient (
+    pat_id               INTEGER PRIMARY KEY,
+    pat_ipp              TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS noyau_patient_ipp ON noyau_patient (pat_ipp);
+CREATE TABLE IF NOT EXISTS metadone_documents (
+    doc_id               INTEGER PRIMARY KEY,
+    doc_pat_id           INTEGER NOT NULL,
+    doc_nom              TEXT,
+    doc_creation_date    TIMESTAMP,
+    doc_realisation_date TIMESTAMP,
+    doc_stockage_id      INTEGER
+);
+CREATE INDEX IF NOT EXISTS metadone_documents_pat
+    ON metadone_documents (doc_pat_id);
+CREATE TABLE IF NOT EXISTS stockage_files (
+    fil_id               INTEGER PRIMARY KEY,
+    fil_data             BLOB
+);
+CREATE TABLE IF NOT EXISTS dwh_patient_ipphist (
+    patient_num          INTEGER NOT NULL,
+    hospital_patient_id  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dwh_document (
+    patient_num          INTEGER NOT NULL,
+    document_origin_code TEXT NOT NULL,
+    document_type        TEXT,
+    title                TEXT,
+    document_date        DATE,
+    displayed_text       TEXT
+);
+"""
+
+_TEMP_DROP = re.compile(
+    r"IF OBJECT_ID\('tempdb\.\.#(\w+)'\) IS NOT NULL DROP TABLE #\w+"
+)
+_DISTINCT_ON = re.compile(r"DISTINCT ON \(([^)]*)\)")
+_ANY = re.compile(r"= ANY\((%\(\w+\)s)\)")
+_PYFORMAT = re.compile(r"%\((\w+)\)s")
+
+
+def check_backend(backend: str):
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Invalid database backend '{backend}'. "
+            f"Choose one of {', '.join(BACKENDS)}."
+        )
+
+
+def describe(database: str) -> str:
+    """Human-readable target of connect(database), for logs."""
+    check_backend(DB_BACKEND)
+    if DB_BACKEND == "sqlite":
+        return f"SQLite ({DB_SQLITE_PATH})"
+    if database == "easily":
+        return f"SQL Server ({EASILY_DB['server']}/{EASILY_DB['database']})"
+    return f"PostgreSQL ({PG_DB['host']}:{PG_DB['port']}/{PG_DB['database']})"
+
+
+def error_class(database: str) -> type[Exception]:
+    """Base exception raised by the driver of database."""
+    check_backend(DB_BACKEND)
+    if DB_BACKEND == "sqlite":
+        return sqlite3.Error
+    if database == "easily":
+        import pyodbc
+
+        return pyodbc.Error
+    import psycopg2
+
+    return psycopg2.Error
+
+
+def connect(database: str):
+    """Open a connection to database ("easily" or "archemed") on DB_BACKEND."""
+    check_backend(DB_BACKEND)
+    if database not in DATABASES:
+        raise ValueError(
+            f"Invalid database '{database}'. Choose one of {', '.join(DATABASES)}."
+        )
+    if DB_BACKEND == "sqlite":
+        return SQLiteConnection(str(DB_SQLITE_PATH), database)
+    if database == "easily":
+        import pyodbc
+
+        return pyodbc.connect(
+            driver="{SQL Server}",
+            host=EASILY_DB["server"],
+            port=1433,
+            database=EASILY_DB["database"],
+            trusted_connection="No",
+            user=EASILY_DB["username"],
+            password=EASILY_DB["password"],
+        )
+    import psycopg2
+
+    return psycopg2.connect(**PG_DB)
+
+
+def _regexp(pattern: str, value) -> bool:
+    return value is not None and re.search(pattern, value, re.IGNORECASE) is not None
+
+
+def to_sqlite(query: str, pyformat: bool) -> str:
+    """Rewrite a SQL Server / PostgreSQL query of this package for SQLite."""
+    for name, table in SQLITE_TABLES.items():
+        query = query.replace(name, table)
+    query = _TEMP_DROP.sub(r"DROP TABLE IF EXISTS temp.\1", query)
+    query = re.sub(r"CREATE TABLE #(\w+)", r"CREATE TEMP TABLE \1", query)
+    query = re.sub(r"#(\w+)", r"temp.\1", query)
+    query = query.replace(" COLLATE DATABASE_DEFAULT", "")
+    query = query.replace("::text", "")
+    query = query.replace("~*", "REGEXP")
+    query = _ANY.sub(r"IN (SELECT value FROM json_each(\1))", query)
+    # DISTINCT ON (a, b): one arbitrary row per group, like the server
+    distinct_on = _DISTINCT_ON.search(query)
+    if distinct_on:
+        query = _DISTINCT_ON.sub("", query, count=1)
+        query = f"{query.rstrip()}\nGROUP BY {distinct_on.group(1)}"
+    if pyformat:
+        query = _PYFORMAT.sub(r":\1", query).replace("%%", "%")
+    return query
+
+
+class SQLiteCursor:
+    """sqlite3 cursor with the pyodbc / psycopg2 cursor API used here."""
+
+    def __init__(self, cursor, pyformat: bool):
+        self._cursor = cursor
+        self._pyformat = pyformat
+        self.itersize = 2000
+        self.fast_executemany = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, query: str, params=None):
+        query = to_sqlite(query, self._pyformat)
+        if isinstance(params, dict):
+            params = {
+                key: json.dumps(value) if isinstance(value, list) else value
+                for key, value in params.items()
+            }
+        statements = [s for s in query.split(";") if s.strip()]
+        for statement in statements[:-1]:
+            self._cursor.execute(statement)
+        self._cursor.execute(statements[-1], params or ())
+        return self
+
+    def executemany(self, query: str, seq_of_params):
+        self._cursor.executemany(to_sqlite(query, self._pyformat), seq_of_params)
+
+    def setinputsizes(self, sizes):
+        pass
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int):
+        return self._cursor.fetchmany(size)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Local stand-in for the Easily (pyodbc) or ARCHEMED (psycopg2) server."""
+
+    def __init__(self, path: str, database: str):
+        self._conn = sqlite3.connect(
+            path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        self._conn.create_function("regexp", 2, _regexp, deterministic=True)
+        self._pyformat = database == "archemed"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def cursor(self, name: str | None = None):
+        return SQLiteCursor(self._conn.cursor(), self._pyformat)
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def create_sqlite_schema(conn: sqlite3.Connection):
+    conn.executescript(SQLITE_SCHEMA)
+
+
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter(
+    "TIMESTAMP", lambda value: datetime.fromisoformat(value.decode())
+)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, datetime.isoformat)
@@ -1,87 +1,422 @@
 """Extract anapath documents from SQL Server (Easily/METADONE).
 
+Rows are fetched in batches (cursor.fetchmany, EASILY_FETCH_SIZE rows) and
+their PDF BLOBs handed to writer threads (EASILY_WRITERS) through a queue
+capped at EASILY_BUFFER_MB, so the network and the disk work at the same
+time while memory stays bounded however large the documents are.
+
+IPP batches are queried concurrently on EASILY_CONNECTIONS connections (one
+per thread, which caps the load on the server); a batch hitting a transient
+error (lost connection, timeout, deadlock) is retried on a new connection.
+
+With --query-mode temp_table (EASILY_QUERY_MODE), the IPP list is instead
+bulk-loaded once into a session temp table (fast_executemany) and the
+documents are streamed by a single join: one query plan and no per-batch
+round trips, whatever the size of the cohort.
+
+Every PDF goes through the document store (DOCUMENT_STORE_DIR): it is saved
+once per content and each doc_stockage_id is mapped to its hash. A PDF whose
+content was already downloaded under another doc_stockage_id is only mapped,
+not written to EXTRACT_ALL_DIR, so later steps handle each report once.
+
+Runs are incremental: the doc_stockage_id already downloaded (mapped in the
+store, or taken from the {pat_ipp}_{doc_stockage_id}.pdf file names in
+EXTRACT_ALL_DIR) are loaded into a #known temp table on each connection and
+excluded by the query, so only new documents are transferred. --full
+downloads everything.
+
 Usage:
-    python -m src.extraction.db_easily
+    python -m src.extraction.db_easily [--writers 4] [--fetch-size 50]
+                                       [--connections 1] [--retries 3]
+                                       [--query-mode batches|temp_table] [--full]
 """
 
+import argparse
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
 
 import pandas as pd
-import pyodbc
+from tqdm import tqdm
 
-from src.config import EASILY_DB, TRANSPLANTS_CSV, EXTRACT_ALL_DIR
+from src.config import (
+    EASILY_BUFFER_MB,
+    EASILY_CONNECTIONS,
+    EASILY_FETCH_SIZE,
+    EASILY_QUERY_MODE,
+    EASILY_RETRIES,
+    EASILY_WRITERS,
+    TRANSPLANTS_CSV,
+    EXTRACT_ALL_DIR,
+    DOCUMENT_STORE_DIR,
+)
+from src.extraction import db_backend
+from src.extraction.document_store import DocumentStore
+from src.extraction.parallel import ThreadSink
 
 log = logging.getLogger(__name__)
 
 
-def main():
-    """Connect to Easily DB and download anapath PDF documents."""
+QUERY = """
+    SELECT p.pat_ipp, d.doc_nom, d.doc_creation_date,
+           d.doc_realisation_date, d.doc_stockage_id, fil_data
+    FROM METADONE.metadone.DOCUMENTS d
+    LEFT JOIN NOYAU.patient.PATIENT p ON d.doc_pat_id = p.pat_id
+    LEFT JOIN STOCKAGE.stockage.FILES f ON f.fil_id = d.doc_stockage_id
+    WHERE doc_nom LIKE '%Anapath%'
+      AND p.pat_ipp IN ({placeholders})
+"""
+
+BATCH_SIZE = 450
+
+# "temp_table" query mode: the IPPs are bulk-loaded once and joined. The
+# explicit collation avoids conflicts between tempdb and the NOYAU database.
+IPP_MAX_LENGTH = 50
+TEMP_TABLE_QUERY = """
+    SELECT p.pat_ipp, d.doc_nom, d.doc_creation_date,
+           d.doc_realisation_date, d.doc_stockage_id, fil_data
+    FROM #ipps i
+    JOIN NOYAU.patient.PATIENT p ON p.pat_ipp = i.pat_ipp COLLATE DATABASE_DEFAULT
+    JOIN METADONE.metadone.DOCUMENTS d ON d.doc_pat_id = p.pat_id
+    LEFT JOIN STOCKAGE.stockage.FILES f ON f.fil_id = d.doc_stockage_id
+    WHERE doc_nom LIKE '%Anapath%'
+"""
+
+QUERY_MODES = ("batches", "temp_table")
+
+# Incremental runs: the doc_stockage_id already downloaded are loaded
+# into #known on every connection and excluded by the queries, so their BLOBs
+# are never transferred
+STOCKAGE_ID_MAX_LENGTH = 64
+STORE_SOURCE = "easily"
+KNOWN_FILTER = f"""
+      AND NOT EXISTS (
+          SELECT 1 FROM #known k
+          WHERE k.doc_stockage_id = CAST(d.doc_stockage_id
+              AS VARCHAR({STOCKAGE_ID_MAX_LENGTH})) COLLATE DATABASE_DEFAULT
+      )
+"""
+
+# SQLSTATEs worth retrying: connection lost, timeouts, deadlock victim
+TRANSIENT_SQLSTATES = {"08S01", "08001", "08004", "HYT00", "HYT01", "40001"}
+RETRY_DELAY = 5
+
+# Driver errors of the configured backend (pyodbc.Error on the server)
+DatabaseError = db_backend.error_class("easily")
+
+# ODBC type code of the temp table columns (pyodbc.SQL_VARCHAR)
+SQL_VARCHAR = 12
+
+
+def connect():
+    """Open a connection to the Easily database (DB_BACKEND)."""
+    return db_backend.connect("easily")
+
+
+class ConnectionPool:
+    """One lazily opened connection per worker thread.
+
+    The pool is used by an executor with as many threads as allowed
+    connections, which caps the load put on the Easily server. setup, if
+    given, is called with every new connection (e.g. to load temp tables).
+    """
+
+    def __init__(self, setup=None):
+        self.setup = setup
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def get(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect()
+            if self.setup is not None:
+                try:
+                    self.setup(connection)
+                except BaseException:
+                    connection.close()
+                    raise
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def discard(self):
+        """Drop the current thread's connection (e.g. after a network error)."""
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is None:
+            return
+        with self._lock:
+            self._connections.remove(connection)
+        try:
+            connection.close()
+        except DatabaseError:
+            pass
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+
+def is_transient(error: Exception) -> bool:
+    return bool(error.args) and error.args[0] in TRANSIENT_SQLSTATES
+
+
+def write_document(store, item):
+    """Store one (filename, fil_data, doc_stockage_id) and write it if unique."""
+    filename, fil_data, doc_stockage_id = item
+    owner = store.add(STORE_SOURCE, doc_stockage_id, fil_data, ".pdf", str(filename))
+    if owner[1] != str(doc_stockage_id):
+        # Its IPP may differ from the owner's: keep the pair in the log
+        log.info(
+            "%s not written: same PDF as doc_stockage_id %s",
+            os.path.basename(str(filename)),
+            owner[1],
+        )
+
+
+def document_size(item) -> int:
+    return len(item[1])
+
+
+def queue_documents(cursor, fetch_size: int, sink, progress):
+    """Fetch the result rows and queue their PDFs for writing.
+
+    Returns (documents, bytes).
+    """
+    saved = size = 0
+    while rows := cursor.fetchmany(fetch_size):
+        for row in rows:
+            if row[5] is None:
+                continue
+            pat_ipp = row[0]
+            doc_stockage_id = row[4]
+            fil_data = row[5]
+            filename = EXTRACT_ALL_DIR / f"{pat_ipp}_{doc_stockage_id}.pdf"
+            sink.put((filename, fil_data, doc_stockage_id))
+            saved += 1
+            size += len(fil_data)
+            progress.update(len(fil_data))
+    return saved, size
+
+
+def with_retries(pool, retries: int, description: str, work):
+    """Run work(connection), retrying transient errors on a fresh connection.
+
+    Documents queued by a failed attempt are simply written again.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return work(pool.get())
+        except DatabaseError as e:
+            if not is_transient(e) or attempt == retries:
+                raise
+            pool.discard()
+            delay = RETRY_DELAY * 2**attempt
+            log.warning("%s failed (%s), retrying in %ds", description, e, delay)
+            time.sleep(delay)
+
+
+def load_temp_table(cursor, table: str, column: str, length: int, values: list):
+    """(Re)create a one-column session temp table and bulk-load values."""
+    cursor.execute(
+        f"IF OBJECT_ID('tempdb..#{table}') IS NOT NULL DROP TABLE #{table}; "
+        f"CREATE TABLE #{table} ({column} VARCHAR({length}) PRIMARY KEY);"
+    )
+    if not values:
+        return
+    cursor.fast_executemany = True
+    cursor.setinputsizes([(SQL_VARCHAR, length, 0)])
+    cursor.executemany(f"INSERT INTO #{table} ({column}) VALUES (?)", values)
+
+
+def load_known(connection, known_ids: list):
+    """Load the doc_stockage_id already downloaded into #known."""
+    with connection.cursor() as cursor:
+        values = [(doc_id,) for doc_id in known_ids]
+        load_temp_table(
+            cursor, "known", "doc_stockage_id", STOCKAGE_ID_MAX_LENGTH, values
+        )
+
+
+def downloaded_ids(directory: str) -> list[str]:
+    """doc_stockage_id of the {pat_ipp}_{doc_stockage_id}.pdf files in directory."""
+    ids = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if ext == ".pdf" and "_" in stem:
+                ids.append(stem.rsplit("_", 1)[1])
+    return sorted(set(ids))
+
+
+def fetch_batch(
+    pool, batch, fetch_size: int, sink, progress, retries: int, incremental: bool
+):
+    """Query one batch of IPPs (IN list) and queue its PDFs for writing."""
+    query = QUERY.format(placeholders=", ".join("?" for _ in batch))
+    if incremental:
+        query += KNOWN_FILTER
+
+    def work(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(query, batch)
+            return queue_documents(cursor, fetch_size, sink, progress)
+
+    return with_retries(pool, retries, f"Batch of {len(batch)} IPPs", work)
+
+
+def ipp_text(value) -> str:
+    """IPP as stored in PATIENT.pat_ipp (pandas may read NIPs as floats)."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def fetch_temp_table(
+    pool, ipps, fetch_size: int, sink, progress, retries: int, incremental: bool
+):
+    """Load every IPP into a session temp table and run a single join.
+
+    One bulk insert and one query plan, whatever the size of the cohort.
+    """
+    values = [(ipp,) for ipp in dict.fromkeys(map(ipp_text, ipps))]
+    query = TEMP_TABLE_QUERY + (KNOWN_FILTER if incremental else "")
+
+    def work(connection):
+        with connection.cursor() as cursor:
+            load_temp_table(cursor, "ipps", "pat_ipp", IPP_MAX_LENGTH, values)
+            cursor.execute(query)
+            return queue_documents(cursor, fetch_size, sink, progress)
+
+    return with_retries(pool, retries, f"Join on {len(values)} IPPs", work)
+
+
+def main(
+    writers: int | None = None,
+    fetch_size: int | None = None,
+    connections: int | None = None,
+    retries: int | None = None,
+    query_mode: str | None = None,
+    full: bool = False,
+):
+    """Connect to Easily DB and download anapath PDF documents.
+
+    In "batches" mode, IPP batches are queried concurrently on up to
+    `connections` connections; in "temp_table" mode, all IPPs are loaded in a
+    temp table and joined in one query. Each query is retried up to `retries`
+    times on transient errors.
+
+    Documents already downloaded (PDF in EXTRACT_ALL_DIR, or mapped in the
+    document store) are excluded by the query itself, unless full is True.
+    Duplicate contents are mapped in the store but not written again.
+    """
+    writers = max(1, writers or EASILY_WRITERS)
+    fetch_size = max(1, fetch_size or EASILY_FETCH_SIZE)
+    connections = max(1, connections or EASILY_CONNECTIONS)
+    retries = EASILY_RETRIES if retries is None else max(0, retries)
+    query_mode = query_mode or EASILY_QUERY_MODE
+    if query_mode not in QUERY_MODES:
+        raise ValueError(
+            f"Invalid query mode '{query_mode}'. "
+            f"Choose one of {', '.join(QUERY_MODES)}."
+        )
     if not TRANSPLANTS_CSV.exists():
         raise FileNotFoundError(f"Transplants file not found: {TRANSPLANTS_CSV}")
 
     df = pd.read_csv(str(TRANSPLANTS_CSV), sep=";", encoding="latin-1")
 
-    log.info(
-        "Connecting to SQL Server (%s/%s)...",
-        EASILY_DB["server"],
-        EASILY_DB["database"],
-    )
-    connection = pyodbc.connect(
-        driver="{SQL Server}",
-        host=EASILY_DB["server"],
-        port=1433,
-        database=EASILY_DB["database"],
-        trusted_connection="No",
-        user=EASILY_DB["username"],
-        password=EASILY_DB["password"],
-    )
-    log.info("Connected")
-
     # Filter valid IPPs and build batches
     filtered_identifiers = df.loc[
         df["NIP"].astype(str).str.strip().str[0].str.isdigit(), "NIP"
     ].tolist()
 
-    batch_size = 450
-    batches = [
-        filtered_identifiers[i : i + batch_size]
-        for i in range(0, len(filtered_identifiers), batch_size)
-    ]
+    if query_mode == "temp_table":
+        batches = [filtered_identifiers]
+        connections = 1
+    else:
+        batches = [
+            filtered_identifiers[i : i + BATCH_SIZE]
+            for i in range(0, len(filtered_identifiers), BATCH_SIZE)
+        ]
 
     os.makedirs(str(EXTRACT_ALL_DIR), exist_ok=True)
 
-    # Process each batch with parameterized queries
-    total_saved = 0
-    for batch in batches:
-        placeholders = ", ".join("?" for _ in batch)
-        query = f"""
-            SELECT p.pat_ipp, d.doc_nom, d.doc_creation_date,
-                   d.doc_realisation_date, d.doc_stockage_id, fil_data
-            FROM METADONE.metadone.DOCUMENTS d
-            LEFT JOIN NOYAU.patient.PATIENT p ON d.doc_pat_id = p.pat_id
-            LEFT JOIN STOCKAGE.stockage.FILES f ON f.fil_id = d.doc_stockage_id
-            WHERE doc_nom LIKE '%Anapath%'
-              AND p.pat_ipp IN ({placeholders})
-        """
+    # Resources are closed in reverse order, each even if closing a later one
+    # failed: a writer error re-raised by sink.close() must not skip the
+    # store commit of the mappings already written
+    with ExitStack() as resources:
+        store = resources.enter_context(DocumentStore(str(DOCUMENT_STORE_DIR)))
+        known_ids = []
+        if not full:
+            known_ids = sorted(
+                store.known_ids(STORE_SOURCE)
+                | set(downloaded_ids(str(EXTRACT_ALL_DIR)))
+            )
+        incremental = bool(known_ids)
+        if incremental:
+            log.info("%d documents already downloaded are skipped", len(known_ids))
 
-        with connection.cursor() as cursor:
-            cursor.execute(query, batch)
-            while True:
-                row = cursor.fetchone()
-                if row is None:
-                    break
-                if row[5] is not None:
-                    pat_ipp = row[0]
-                    doc_stockage_id = row[4]
-                    fil_data = row[5]
-                    filename = EXTRACT_ALL_DIR / f"{pat_ipp}_{doc_stockage_id}.pdf"
-                    with open(str(filename), "wb") as f:
-                        f.write(fil_data)
-                    total_saved += 1
-
-    connection.close()
-    log.info("Extraction complete: %d documents saved to %s", total_saved, EXTRACT_ALL_DIR)
+        log.info(
+            "Connecting to %s, %s mode: %d queries on %d connection(s)",
+            db_backend.describe("easily"),
+            query_mode,
+            len(batches),
+            connections,
+        )
+        setup = partial(load_known, known_ids=known_ids) if incremental else None
+        pool = ConnectionPool(setup)
+        resources.callback(pool.close)
+
+        # Batches run on the executor's threads; BLOBs are written by the
+        # sink's threads while the next rows are fetched
+        total_saved = 0
+        total_bytes = 0
+        start = time.perf_counter()
+        progress = tqdm(
+            desc="Downloading", unit="B", unit_scale=True, unit_divisor=1024
+        )
+        resources.callback(progress.close)
+        sink = ThreadSink(
+            partial(write_document, store),
+            workers=writers,
+            max_pending=EASILY_BUFFER_MB * 1024 * 1024,
+            weight=document_size,
+        )
+        resources.callback(sink.close)
+        fetch = partial(
+            fetch_temp_table if query_mode == "temp_table" else fetch_batch,
+            pool,
+            fetch_size=fetch_size,
+            sink=sink,
+            progress=progress,
+            retries=retries,
+            incremental=incremental,
+        )
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for saved, size in executor.map(fetch, batches):
+                total_saved += saved
+                total_bytes += size
+
+    elapsed = time.perf_counter() - start
+    log.info(
+        "Extraction complete: %d documents downloaded, %d unique saved to %s "
+        "(%.1f MB in %.1fs, %.1f MB/s)",
+        total_saved,
+        store.added,
+        EXTRACT_ALL_DIR,
+        total_bytes / 1024 / 1024,
+        elapsed,
+        total_bytes / 1024 / 1024 / elapsed if elapsed else 0.0,
+    )
 
 
 if __name__ == "__main__":
@@ -89,4 +424,48 @@ if __name__ == "__main__":
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     )
-    main()
+    parser = argparse.ArgumentParser(description="Extract Easily documents.")
+    parser.add_argument(
+        "--writers",
+        type=int,
+        default=EASILY_WRITERS,
+        help="Number of threads writing PDFs to disk",
+    )
+    parser.add_argument(
+        "--fetch-size",
+        type=int,
+        default=EASILY_FETCH_SIZE,
+        help="Rows fetched from the server per round trip",
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=EASILY_CONNECTIONS,
+        help="Number of IPP batches queried at once (one connection each)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=EASILY_RETRIES,
+        help="Retries of a batch after a transient database error",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Download every document again, including those already on disk",
+    )
+    parser.add_argument(
+        "--query-mode",
+        choices=QUERY_MODES,
+        default=EASILY_QUERY_MODE,
+        help="IN-list batches, or one join on a temp table of IPPs",
+    )
+    args = parser.parse_args()
+    main(
+        writers=args.writers,
+        fetch_size=args.fetch_size,
+        connections=args.connections,
+        retries=args.retries,
+        query_mode=args.query_mode,
+        full=args.full,
+    )
@@ -0,0 +1,154 @@
+"""Content-addressed store of downloaded documents.
+
+Every document (Easily PDF, ARCHEMED text) is saved once under
+DOCUMENT_STORE_DIR/objects, named by the SHA-256 of its content, and a SQLite
+table maps each source identifier to that hash. The first source identifier
+seen for a content owns it: only that one is materialized (hard link, or copy)
+in the extraction folders, so the same report stored under several IDs is
+filtered, converted and extracted once. A mapping is recorded only after its
+files are written, so an interrupted download is fetched again.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source    TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    sha256    TEXT NOT NULL,
+    added_at  TEXT NOT NULL,
+    PRIMARY KEY (source, source_id)
+);
+CREATE INDEX IF NOT EXISTS sources_sha256 ON sources (sha256);
+"""
+
+COMMIT_EVERY = 200
+
+
+def place(object_path: str, dest: str):
+    """Make a stored object available at dest (hard link, or copy)."""
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(object_path, dest)
+    except OSError:
+        shutil.copyfile(object_path, dest)
+
+
+class DocumentStore:
+    """Objects directory plus source-ID -> hash mapping. Thread-safe."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.conn = sqlite3.connect(
+            os.path.join(root, "store.sqlite"), check_same_thread=False
+        )
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.added = 0
+        self.duplicates = 0
+        # Contents being written, by SHA-256 (their mapping is not recorded yet)
+        self._writing = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+    def object_path(self, sha256: str, suffix: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256 + suffix)
+
+    def known_ids(self, source: str) -> set[str]:
+        """Identifiers already mapped for a source."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT source_id FROM sources WHERE source = ?", (source,)
+            )
+            return {row[0] for row in rows}
+
+    def _owner(self, sha256: str):
+        """(source, source_id) materialized for a content, None if unknown."""
+        return self.conn.execute(
+            "SELECT source, source_id FROM sources WHERE sha256 = ? "
+            "ORDER BY rowid LIMIT 1",
+            (sha256,),
+        ).fetchone()
+
+    def _map(self, key: tuple, sha256: str):
+        """Record key -> sha256 (caller holds the lock)."""
+        row = self.conn.execute(
+            "SELECT sha256 FROM sources WHERE source = ? AND source_id = ?", key
+        ).fetchone()
+        if row is not None and row[0] == sha256:
+            return
+        if row is not None and self._owner(row[0]) == key:
+            # The identifier no longer holds its former content: the others
+            # mapped to it were never materialized, forget them so that they
+            # are fetched again instead of counting as duplicates of nothing
+            self.conn.execute("DELETE FROM sources WHERE sha256 = ?", (row[0],))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+            (*key, sha256, datetime.now().isoformat(timespec="seconds")),
+        )
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.conn.commit()
+            self._pending = 0
+
+    def add(self, source: str, source_id: str, data: bytes, suffix: str, dest: str):
+        """Store data, map (source, source_id) to it and materialize it at dest.
+
+        The mapping is recorded only once the object, and the file at dest for
+        the owner of the content, both exist: if writing fails, the identifier
+        stays unknown and is fetched again on the next run. Returns the
+        (source, source_id) owning the content: the key itself when dest was
+        written, the first identifier seen for it when data is a duplicate
+        (dest is then not written).
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        key = (source, str(source_id))
+        while True:
+            with self._lock:
+                owner = self._owner(sha256)
+                if owner is not None and owner != key:
+                    self._map(key, sha256)
+                    self.duplicates += 1
+                    return owner
+                writing = self._writing.get(sha256)
+                if writing is None:
+                    writing = self._writing[sha256] = threading.Event()
+                    break
+            # Another thread is writing the same content: wait for its outcome
+            writing.wait()
+
+        try:
+            path = self.object_path(sha256, suffix)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            place(path, dest)
+            with self._lock:
+                self._map(key, sha256)
+                self.added += 1
+        finally:
+            with self._lock:
+                del self._writing[sha256]
+            writing.set()
+        return key
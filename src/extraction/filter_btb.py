@@ -2,17 +2,76 @@
 
 Scans PDF/TXT files for BTB keywords and copies matching files to a destination folder.
 
+In fused mode (--fused / FILTER_FUSED), the page text already extracted for
+the keyword search is written straight to EXTRACT_BTB_TXT_DIR for matching
+documents, so each PDF is parsed once and the pdf_to_text step has nothing
+left to do. That text is PyMuPDF's: fused mode is refused unless
+PDF_TO_TEXT_BACKEND is "pymupdf", so that the extracted texts do not depend on
+which step wrote them.
+
+Keywords are matched case-insensitively by a single compiled KeywordMatcher,
+ignoring accents for inclusion keywords only (FOLD_*_ACCENTS), and every
+decision is recorded with the keywords that caused it in filter_audit.tsv
+(destination folder).
+
+Reruns are resumable: every verdict is stored in a SQLite manifest keyed by
+filename, size, mtime and content hash, and only new or modified files are
+checked again. Verdicts also record the keyword lists and the output mode
+(fused or not) they were made with; changing either re-checks every file.
+
+Matching PDFs are copied to the destination by default. Other output modes
+(--output-mode / FILTER_OUTPUT_MODE) avoid duplicating the data:
+    hardlink -- hard link to the source file (falls back to symlink)
+    symlink  -- symbolic link to the source file (falls back to manifest)
+    manifest -- nothing is written next to the PDFs; the absolute source
+                paths are listed in btb_files.txt, read by pdf_to_text
+
+Keyword checks can be spread over a process pool (--workers N /
+FILTER_WORKERS). Results are consumed in sorted filename order, so the error
+log and the copy decisions do not depend on the number of workers.
+
+With --archemed, the per-patient folders of EXTRACT_ARCHEMED_DIR are walked
+recursively and the .txt extracts are scanned through a memory map (UTF-8
+bytes, never decoded as a whole); matches are flattened into
+EXTRACT_FILTERED_BTB_DIR_ARCHEMED, ready for extract_btb (manifest and logs
+go to its filter_state/ subfolder).
+
 Usage:
-    python -m src.extraction.filter_btb
+    python -m src.extraction.filter_btb [--fused] [--workers N] [--retry-errors]
+                                        [--output-mode copy|hardlink|symlink|manifest]
+    python -m src.extraction.filter_btb --archemed [--workers N] [--retry-errors]
+                                        [--output-mode copy|hardlink|symlink]
 """
 
+import argparse
 import logging
+import mmap
 import os
+import re
 import shutil
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 
 import fitz  # PyMuPDF
 
-from src.config import EXTRACT_ALL_DIR, EXTRACT_FILTERED_BTB_DIR
+from src.config import (
+    EXTRACT_ALL_DIR,
+    EXTRACT_ARCHEMED_DIR,
+    EXTRACT_BTB_TXT_DIR,
+    EXTRACT_FILTERED_BTB_DIR,
+    EXTRACT_FILTERED_BTB_DIR_ARCHEMED,
+    FILTER_FUSED,
+    FILTER_OUTPUT_MODE,
+    FILTER_WORKERS,
+    PDF_TO_TEXT_BACKEND,
+)
+from src.extraction.filter_manifest import (
+    FilterManifest,
+    settings_fingerprint,
+    sha256_bytes,
+)
+from src.extraction.pdf_to_text import INPUT_LIST_NAME, join_pages
 
 log = logging.getLogger(__name__)
 
@@ -27,84 +86,600 @@ INCLUSION_KEYWORDS = [
 
 EXCLUSION_KEYWORDS = ["Annulé"]
 
+# Whether each list also ignores accents. Exclusion keywords stay accent-exact:
+# "Annulé" must not match "annule" ("annule et remplace" reports are kept)
+FOLD_INCLUSION_ACCENTS = True
+FOLD_EXCLUSION_ACCENTS = False
+
+# Number of files sent to a worker process at once
+CHECK_CHUNK_SIZE = 16
+
+# Verdict manifest (see filter_manifest.py), stored in the destination folder
+MANIFEST_NAME = "filter_manifest.sqlite"
+MANIFEST_COMMIT_EVERY = 200
+
+OUTPUT_MODES = ("copy", "hardlink", "symlink", "manifest")
+
+# Subfolder of the ARCHEMED destination holding the manifest and logs
+ARCHEMED_STATE_DIR = "filter_state"
+
+# Letters that documents may carry with or without an accent
+ACCENT_VARIANTS = {
+    "a": "aàâä",
+    "c": "cç",
+    "e": "eéèêë",
+    "i": "iîï",
+    "o": "oôö",
+    "u": "uùûü",
+    "y": "yÿ",
+}
+
+
+# In HTML, any character may be written as a character reference
+SQL_CHAR_REFERENCE = "&#?[0-9a-z]{1,10};?"
+
+
+def strip_accents(text: str) -> str:
+    """Remove diacritics (é -> e, Ç -> C)."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def keyword_regex(keyword: str, fold_accents: bool = True) -> str:
+    """Regex source matching keyword as a substring, ignoring accents if asked.
+
+    Meant to be compiled with re.IGNORECASE, which handles case folding.
+    """
+    if not fold_accents:
+        return re.escape(keyword)
+    parts = []
+    for char in strip_accents(keyword).lower():
+        variants = ACCENT_VARIANTS.get(char)
+        parts.append(f"[{variants}]" if variants else re.escape(char))
+    return "".join(parts)
+
+
+def keyword_bytes_regex(keyword: str, fold_accents: bool = True) -> bytes:
+    """Same as keyword_regex, for UTF-8 encoded bytes.
+
+    re.IGNORECASE only folds ASCII letters on bytes, so accented letters are
+    spelled out in both cases.
+    """
+    parts = []
+    for char in strip_accents(keyword).lower() if fold_accents else keyword.lower():
+        variants = ACCENT_VARIANTS.get(char, char) if fold_accents else char
+        encoded = {v.encode("utf-8") for v in variants + variants.upper()}
+        if len(encoded) == 2 and all(len(v) == 1 for v in encoded):
+            parts.append(re.escape(char.encode("utf-8")))
+            continue
+        parts.append(b"(?:" + b"|".join(sorted(map(re.escape, encoded))) + b")")
+    return b"".join(parts)
+
+
+def keyword_sql_regex(keyword: str) -> str:
+    """Loose PostgreSQL regex (for ~*) finding keyword in raw HTML.
+
+    Any character may also be written as a character reference (&eacute;,
+    &#233;), so the pattern matches at least every document whose text
+    contains the keyword. Meant as a server-side pre-filter only.
+    """
+    parts = []
+    for char in strip_accents(keyword).lower():
+        variants = ACCENT_VARIANTS.get(char, char)
+        letters = sorted(set(variants + variants.upper()))
+        letters = "".join(re.escape(c) for c in letters)
+        parts.append(f"(?:[{letters}]|{SQL_CHAR_REFERENCE})")
+    return "".join(parts)
+
+
+class KeywordMatcher:
+    """Find every inclusion and exclusion keyword in a single pass over a text.
+
+    All keywords are compiled into one case-insensitive alternation (longest
+    keywords first), with one named group per keyword so that each hit can
+    be reported for auditing. Accents are ignored in the lists whose fold
+    flag is set.
+    """
+
+    def __init__(
+        self,
+        inclusion_keywords,
+        exclusion_keywords,
+        fold_inclusion: bool = FOLD_INCLUSION_ACCENTS,
+        fold_exclusion: bool = FOLD_EXCLUSION_ACCENTS,
+    ):
+        self.keywords = {}
+        alternatives = []
+        for kind, keywords, fold in (
+            ("i", inclusion_keywords, fold_inclusion),
+            ("e", exclusion_keywords, fold_exclusion),
+        ):
+            for index, keyword in enumerate(keywords):
+                group = f"{kind}{index}"
+                self.keywords[group] = keyword
+                alternatives.append((len(keyword), group, keyword, fold))
+        alternatives.sort(key=lambda alt: -alt[0])
+        self.regex = re.compile(
+            "|".join(
+                f"(?P<{group}>{keyword_regex(keyword, fold)})"
+                for _, group, keyword, fold in alternatives
+            ),
+            re.IGNORECASE,
+        )
+        self.bytes_regex = re.compile(
+            b"|".join(
+                b"(?P<%s>%s)" % (group.encode(), keyword_bytes_regex(keyword, fold))
+                for _, group, keyword, fold in alternatives
+            ),
+            re.IGNORECASE,
+        )
+
+    def scan(self, text: str, inclusion_hits: list, exclusion_hits: list):
+        """Append the keywords found in text to the hit lists (no duplicates)."""
+        for match in self.regex.finditer(text):
+            group = match.lastgroup
+            hits = inclusion_hits if group[0] == "i" else exclusion_hits
+            keyword = self.keywords[group]
+            if keyword not in hits:
+                hits.append(keyword)
 
-def check_keywords(filepath, inclusion_keywords, exclusion_keywords):
-    """Check if inclusion/exclusion keywords exist within a PDF document."""
+    def scan_bytes(self, data, inclusion_hits: list, exclusion_hits: list):
+        """Like scan, on UTF-8 bytes or any buffer (e.g. an mmap)."""
+        for match in self.bytes_regex.finditer(data):
+            group = match.lastgroup
+            hits = inclusion_hits if group[0] == "i" else exclusion_hits
+            keyword = self.keywords[group]
+            if keyword not in hits:
+                hits.append(keyword)
+
+
+@lru_cache(maxsize=8)
+def get_matcher(inclusion_keywords: tuple, exclusion_keywords: tuple) -> KeywordMatcher:
+    """Compile (once per process) the matcher for a pair of keyword lists."""
+    return KeywordMatcher(inclusion_keywords, exclusion_keywords)
+
+
+def check_keywords(
+    filepath, inclusion_keywords, exclusion_keywords, keep_text=False, data=None
+):
+    """Check if inclusion/exclusion keywords exist within a PDF document.
+
+    Returns (inclusion_hits, exclusion_hits, error, text). The hit lists hold
+    the keywords found (empty lists mean no match). text is the full document
+    text when keep_text is True (every page is then read), None otherwise.
+    When the file content is already in memory, pass it as data.
+    """
+    matcher = get_matcher(tuple(inclusion_keywords), tuple(exclusion_keywords))
     try:
-        doc = fitz.open(filepath)
-        has_inclusion, has_exclusion = False, False
+        if data is None:
+            doc = fitz.open(filepath)
+        else:
+            doc = fitz.open(stream=data, filetype="pdf")
+        inclusion_hits, exclusion_hits = [], []
+        pages = []
         for page in doc:
-            page_text = page.get_text().upper()
-            if not has_inclusion:
-                for keyword in inclusion_keywords:
-                    if keyword.upper() in page_text:
-                        has_inclusion = True
-                        break
-            if not has_exclusion:
-                for keyword in exclusion_keywords:
-                    if keyword.upper() in page_text:
-                        has_exclusion = True
-                        break
-            if has_inclusion and has_exclusion:
+            page_text = page.get_text()
+            if keep_text:
+                pages.append(page_text)
+            matcher.scan(page_text, inclusion_hits, exclusion_hits)
+            if inclusion_hits and exclusion_hits and not keep_text:
                 break
         doc.close()
-        return has_inclusion, has_exclusion, None
+        text = join_pages(pages) if keep_text else None
+        return inclusion_hits, exclusion_hits, None, text
     except ValueError as e:
         if "document closed or encrypted" in str(e):
-            return False, False, "encrypted"
-        return False, False, str(e)
+            return [], [], "encrypted", None
+        return [], [], str(e), None
     except Exception as e:
-        return False, False, str(e)
+        return [], [], str(e), None
 
 
-def main(
-    source_dir: str | None = None,
-    dest_dir: str | None = None,
-):
-    """Filter documents by BTB keywords and copy matches to destination."""
-    source = source_dir or str(EXTRACT_ALL_DIR)
-    dest = dest_dir or str(EXTRACT_FILTERED_BTB_DIR)
+def _check_file(pdf_path: str, known_sha256: str | None, keep_text: bool):
+    """Read a PDF once, hash it and check its keywords.
 
-    os.makedirs(source, exist_ok=True)
-    os.makedirs(dest, exist_ok=True)
+    Returns (size, mtime_ns, sha256, result), result being the check_keywords
+    tuple, or None when the content hash equals known_sha256.
+    """
+    try:
+        stat = os.stat(pdf_path)
+        with open(pdf_path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        return 0, 0, None, ([], [], str(e), None)
+    sha256 = sha256_bytes(data)
+    if sha256 == known_sha256:
+        return stat.st_size, stat.st_mtime_ns, sha256, None
+    result = check_keywords(
+        pdf_path, INCLUSION_KEYWORDS, EXCLUSION_KEYWORDS, keep_text, data=data
+    )
+    return stat.st_size, stat.st_mtime_ns, sha256, result
 
-    all_pdf_files = sorted([f for f in os.listdir(source) if f.endswith(".pdf")])
 
-    # Resume support: skip already processed files
-    dest_pdf_files = sorted([f for f in os.listdir(dest) if f.endswith(".pdf")])
-    start_index = 0
-    if dest_pdf_files:
-        last_processed = dest_pdf_files[-1]
-        if last_processed in all_pdf_files:
-            start_index = all_pdf_files.index(last_processed) + 1
-            log.info("Resuming from file %d of %d", start_index, len(all_pdf_files))
+def _check_text_file(txt_path: str, known_sha256: str | None):
+    """Hash and check the keywords of a UTF-8 text file through a memory map.
+
+    Same return value as _check_file; the file is never loaded as a whole.
+    """
+    matcher = get_matcher(tuple(INCLUSION_KEYWORDS), tuple(EXCLUSION_KEYWORDS))
+    try:
+        with open(txt_path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0:
+                sha256 = sha256_bytes(b"")
+                result = ([], [], None, None)
+                if sha256 == known_sha256:
+                    result = None
+                return stat.st_size, stat.st_mtime_ns, sha256, result
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                sha256 = sha256_bytes(mapped)
+                if sha256 == known_sha256:
+                    return stat.st_size, stat.st_mtime_ns, sha256, None
+                inclusion_hits, exclusion_hits = [], []
+                matcher.scan_bytes(mapped, inclusion_hits, exclusion_hits)
+        return (
+            stat.st_size,
+            stat.st_mtime_ns,
+            sha256,
+            (inclusion_hits, exclusion_hits, None, None),
+        )
+    except (OSError, ValueError) as e:
+        return 0, 0, None, ([], [], str(e), None)
+
+
+def _iter_checks(check, paths: list[str], known_hashes: list, workers: int):
+    """Yield check(path, known_hash) for every path, in order."""
+    if workers <= 1:
+        yield from map(check, paths, known_hashes)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(check, paths, known_hashes, chunksize=CHECK_CHUNK_SIZE)
+
+
+def _bootstrap_manifest(manifest, source, dest, txt_output, all_pdf_files):
+    """Record files kept by a run made before the manifest existed."""
+    kept = {f for f in os.listdir(dest) if f.endswith(".pdf")}
+    if os.path.isdir(txt_output):
+        kept.update(
+            os.path.splitext(f)[0] + ".pdf"
+            for f in os.listdir(txt_output)
+            if f.endswith(".txt")
+        )
+    kept.intersection_update(all_pdf_files)
+    for filename in sorted(kept):
+        stat = os.stat(os.path.join(source, filename))
+        manifest.record(filename, stat.st_size, stat.st_mtime_ns, None, "included")
+    manifest.commit()
+    if kept:
+        log.info("Manifest initialised with %d previously kept files", len(kept))
+
+
+def _remove_outputs(paths):
+    """Remove the outputs of a document that is no longer included."""
+    for path in paths:
+        if os.path.lexists(path):
+            os.remove(path)
+
+
+def _place_output(file_path: str, dest: str, output_mode: str) -> str:
+    """Make a kept file available in dest; return the mode actually used.
+
+    "manifest" means nothing was written: the file is only listed in the
+    input list built at the end of the run.
+    """
+    if output_mode == "copy":
+        shutil.copy(file_path, dest)
+        return "copy"
+    target = os.path.join(dest, os.path.basename(file_path))
+    if output_mode in ("hardlink", "symlink") and os.path.lexists(target):
+        os.remove(target)
+    if output_mode == "hardlink":
+        try:
+            os.link(file_path, target)
+            return "hardlink"
+        except OSError:
+            output_mode = "symlink"
+    if output_mode == "symlink":
+        try:
+            os.symlink(os.path.abspath(file_path), target)
+            return "symlink"
+        except OSError:
+            pass
+    return "manifest"
 
-    files_to_process = all_pdf_files[start_index:]
-    log.info("Total: %d, To process: %d", len(all_pdf_files), len(files_to_process))
 
-    error_log_path = os.path.join(dest, "error_documents.txt")
+def _write_input_list(manifest, source: str, dest: str) -> int:
+    """List the kept PDFs that have no file in dest, for pdf_to_text."""
+    paths = [
+        os.path.abspath(os.path.join(source, filename))
+        for filename in manifest.included()
+        if not os.path.lexists(os.path.join(dest, filename))
+        and os.path.exists(os.path.join(source, filename))
+    ]
+    list_path = os.path.join(dest, INPUT_LIST_NAME)
+    if paths:
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.writelines(f"{path}\n" for path in paths)
+    elif os.path.exists(list_path):
+        os.remove(list_path)
+    return len(paths)
+
+
+def _check_output_mode(output_mode: str):
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(
+            f"Invalid output mode '{output_mode}'. "
+            f"Choose one of {', '.join(OUTPUT_MODES)}."
+        )
+
+
+def _filter_settings(mode: str) -> str:
+    """Fingerprint of the keywords and output mode behind the verdicts."""
+    return settings_fingerprint(
+        {
+            "inclusion": INCLUSION_KEYWORDS,
+            "exclusion": EXCLUSION_KEYWORDS,
+            "fold_inclusion": FOLD_INCLUSION_ACCENTS,
+            "fold_exclusion": FOLD_EXCLUSION_ACCENTS,
+            "mode": mode,
+        }
+    )
+
+
+def _run_filter(
+    manifest,
+    source: str,
+    log_dir: str,
+    all_files: list[str],
+    check,
+    keep,
+    discard,
+    workers: int,
+    retry_errors: bool,
+) -> tuple[int, int]:
+    """Check the files of source that need it and apply the verdicts.
+
+    all_files are paths relative to source. check(path, known_sha256) is run
+    (possibly in worker processes) for new or modified files; keep(filename,
+    path, text) is called for included ones and discard(filename) for files
+    that were included before and no longer are. error_documents.txt and
+    filter_audit.tsv are written to log_dir. Returns (kept, unchanged).
+    """
+    error_log_path = os.path.join(log_dir, "error_documents.txt")
     error_mode = "a" if os.path.exists(error_log_path) else "w"
 
-    copied = 0
-    with open(error_log_path, error_mode) as error_log:
-        for filename in files_to_process:
-            pdf_path = os.path.join(source, filename)
+    # Audit trail: which keywords decided each document
+    audit_path = os.path.join(log_dir, "filter_audit.tsv")
+    new_audit = not os.path.exists(audit_path)
+
+    # Resume support: skip files already decided and unchanged since
+    files_to_process, known_hashes = manifest.plan(source, all_files, retry_errors)
+    log.info(
+        "Total: %d, already decided: %d, to process: %d (%d worker(s))",
+        len(all_files),
+        len(all_files) - len(files_to_process),
+        len(files_to_process),
+        workers,
+    )
+
+    paths = [os.path.join(source, f) for f in files_to_process]
+    results = _iter_checks(
+        check, paths, [known_hashes.get(f) for f in files_to_process], workers
+    )
+
+    kept = unchanged = 0
+    with (
+        open(error_log_path, error_mode) as error_log,
+        open(audit_path, "a", encoding="utf-8") as audit,
+    ):
+        if new_audit:
+            audit.write("filename\tverdict\tinclusion_hits\texclusion_hits\n")
+        for i, (filename, path, (size, mtime_ns, sha256, result)) in enumerate(
+            zip(files_to_process, paths, results), start=1
+        ):
+            if i % MANIFEST_COMMIT_EVERY == 0:
+                manifest.commit()
+            if result is None:
+                manifest.touch(filename, size, mtime_ns)
+                unchanged += 1
+                continue
+            previous = manifest.verdict(filename)
             try:
-                has_inclusion, has_exclusion, error = check_keywords(
-                    pdf_path, INCLUSION_KEYWORDS, EXCLUSION_KEYWORDS
-                )
+                inclusion_hits, exclusion_hits, error, text = result
                 if error:
+                    manifest.record(
+                        filename, size, mtime_ns, sha256, "error", error=error
+                    )
+                    audit.write(f"{filename}\terror\t\t\n")
                     error_log.write(f"{filename}\n")
                     log.warning("Could not process %s: %s", filename, error)
                     continue
-                if has_inclusion and not has_exclusion:
-                    shutil.copy(pdf_path, dest)
-                    copied += 1
+                if exclusion_hits:
+                    verdict = "excluded"
+                elif inclusion_hits:
+                    verdict = "included"
+                else:
+                    verdict = "no_match"
+                audit.write(
+                    f"{filename}\t{verdict}\t{'|'.join(inclusion_hits)}"
+                    f"\t{'|'.join(exclusion_hits)}\n"
+                )
+                if verdict == "included":
+                    keep(filename, path, text)
+                    kept += 1
+                elif previous == "included":
+                    discard(filename)
+                manifest.record(
+                    filename,
+                    size,
+                    mtime_ns,
+                    sha256,
+                    verdict,
+                    inclusion_hits,
+                    exclusion_hits,
+                )
             except Exception as e:
+                manifest.record(
+                    filename, size, mtime_ns, sha256, "error", error=str(e)
+                )
                 error_log.write(f"{filename}\n")
                 log.error("Error processing %s: %s", filename, e)
 
-    log.info("Filtering done: %d files copied to %s", copied, dest)
+    if unchanged:
+        log.info("%d modified files had unchanged content (verdict kept)", unchanged)
+    return kept, unchanged
+
+
+def main(
+    source_dir: str | None = None,
+    dest_dir: str | None = None,
+    fused: bool | None = None,
+    txt_dir: str | None = None,
+    workers: int | None = None,
+    retry_errors: bool = False,
+    output_mode: str | None = None,
+):
+    """Filter documents by BTB keywords and copy matches to destination.
+
+    In fused mode, matches are written as text to txt_dir instead of copied;
+    otherwise output_mode decides how they are made available in dest.
+    Files already decided in the manifest with the same keywords and mode,
+    and unchanged since, are skipped; with retry_errors, files that
+    previously failed are checked again.
+    """
+    source = source_dir or str(EXTRACT_ALL_DIR)
+    dest = dest_dir or str(EXTRACT_FILTERED_BTB_DIR)
+    fused = FILTER_FUSED if fused is None else fused
+    txt_output = txt_dir or str(EXTRACT_BTB_TXT_DIR)
+    workers = max(1, workers or FILTER_WORKERS)
+    output_mode = output_mode or FILTER_OUTPUT_MODE
+    _check_output_mode(output_mode)
+    if fused and PDF_TO_TEXT_BACKEND != "pymupdf":
+        raise ValueError(
+            f"Fused mode writes PyMuPDF text, but PDF_TO_TEXT_BACKEND is "
+            f"'{PDF_TO_TEXT_BACKEND}'. Set PDF_TO_TEXT_BACKEND=pymupdf or run "
+            f"without --fused."
+        )
+
+    os.makedirs(source, exist_ok=True)
+    os.makedirs(dest, exist_ok=True)
+    if fused:
+        os.makedirs(txt_output, exist_ok=True)
+
+    all_pdf_files = sorted([f for f in os.listdir(source) if f.endswith(".pdf")])
+    placed = dict.fromkeys(OUTPUT_MODES, 0)
+
+    def keep(filename, pdf_path, text):
+        if fused:
+            txt_path = os.path.join(txt_output, os.path.splitext(filename)[0] + ".txt")
+            with open(txt_path, "w", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            placed[_place_output(pdf_path, dest, output_mode)] += 1
+
+    def discard(filename):
+        _remove_outputs(
+            [
+                os.path.join(dest, filename),
+                os.path.join(txt_output, os.path.splitext(filename)[0] + ".txt"),
+            ]
+        )
+
+    settings = _filter_settings("fused" if fused else output_mode)
+    with FilterManifest(os.path.join(dest, MANIFEST_NAME), settings) as manifest:
+        if not len(manifest):
+            _bootstrap_manifest(manifest, source, dest, txt_output, all_pdf_files)
+        kept, _ = _run_filter(
+            manifest,
+            source,
+            dest,
+            all_pdf_files,
+            partial(_check_file, keep_text=fused),
+            keep,
+            discard,
+            workers,
+            retry_errors,
+        )
+        listed = 0 if fused else _write_input_list(manifest, source, dest)
+
+    if fused:
+        log.info("Filtering done: %d files written as text to %s", kept, txt_output)
+        return
+    log.info(
+        "Filtering done: %d files kept in %s (%s)",
+        kept,
+        dest,
+        ", ".join(f"{n} {mode}" for mode, n in placed.items() if n) or "none new",
+    )
+    if listed:
+        log.info("%d kept files listed in %s", listed, INPUT_LIST_NAME)
+
+
+def main_archemed(
+    source_dir: str | None = None,
+    dest_dir: str | None = None,
+    workers: int | None = None,
+    retry_errors: bool = False,
+    output_mode: str | None = None,
+):
+    """Filter the ARCHEMED text extracts by BTB keywords.
+
+    Walks the per-patient folders of source_dir recursively and puts the
+    matching .txt files, flattened, in dest_dir, ready for extract_btb.
+    extract_btb needs real files in dest_dir, so "manifest" is replaced by
+    "hardlink" and a failed link falls back to a copy.
+    """
+    source = source_dir or str(EXTRACT_ARCHEMED_DIR)
+    dest = dest_dir or str(EXTRACT_FILTERED_BTB_DIR_ARCHEMED)
+    workers = max(1, workers or FILTER_WORKERS)
+    output_mode = output_mode or FILTER_OUTPUT_MODE
+    _check_output_mode(output_mode)
+    if output_mode == "manifest":
+        log.warning("extract_btb reads real files: using hardlink instead of manifest")
+        output_mode = "hardlink"
+
+    # Keep the filter's own files out of the .txt folder read by extract_btb
+    state_dir = os.path.join(dest, ARCHEMED_STATE_DIR)
+    os.makedirs(source, exist_ok=True)
+    os.makedirs(state_dir, exist_ok=True)
+
+    all_txt_files = sorted(
+        os.path.relpath(os.path.join(root, f), source)
+        for root, _, files in os.walk(source)
+        for f in files
+        if f.endswith(".txt")
+    )
+    placed = dict.fromkeys(OUTPUT_MODES, 0)
+
+    def keep(filename, txt_path, text):
+        mode = _place_output(txt_path, dest, output_mode)
+        if mode == "manifest":
+            mode = _place_output(txt_path, dest, "copy")
+        placed[mode] += 1
+
+    def discard(filename):
+        _remove_outputs([os.path.join(dest, os.path.basename(filename))])
+
+    manifest_path = os.path.join(state_dir, MANIFEST_NAME)
+    with FilterManifest(manifest_path, _filter_settings(output_mode)) as manifest:
+        kept, _ = _run_filter(
+            manifest,
+            source,
+            state_dir,
+            all_txt_files,
+            _check_text_file,
+            keep,
+            discard,
+            workers,
+            retry_errors,
+        )
+
+    log.info(
+        "ARCHEMED filtering done: %d files kept in %s (%s)",
+        kept,
+        dest,
+        ", ".join(f"{n} {mode}" for mode, n in placed.items() if n) or "none new",
+    )
 
 
 if __name__ == "__main__":
@@ -112,4 +687,48 @@ if __name__ == "__main__":
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     )
-    main()
+    parser = argparse.ArgumentParser(description="Filter BTB documents.")
+    parser.add_argument(
+        "--fused",
+        action="store_true",
+        default=FILTER_FUSED,
+        help="Write matching documents as text to EXTRACT_BTB_TXT_DIR",
+    )
+    parser.add_argument(
+        "--archemed",
+        action="store_true",
+        help="Filter the ARCHEMED text extracts (recursive, .txt files)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=FILTER_WORKERS,
+        help="Number of processes checking keywords",
+    )
+    parser.add_argument(
+        "--retry-errors",
+        action="store_true",
+        help="Check again the files that previously failed",
+    )
+    parser.add_argument(
+        "--output-mode",
+        choices=OUTPUT_MODES,
+        default=FILTER_OUTPUT_MODE,
+        help="How kept PDFs are made available to pdf_to_text",
+    )
+    args = parser.parse_args()
+    if args.archemed:
+        if args.fused:
+            parser.error("--archemed and --fused cannot be combined")
+        main_archemed(
+            workers=args.workers,
+            retry_errors=args.retry_errors,
+            output_mode=args.output_mode,
+        )
+    else:
+        main(
+            fused=args.fused,
+            workers=args.workers,
+            retry_errors=args.retry_errors,
+            output_mode=args.output_mode,
+        )
@@ -0,0 +1,161 @@
+"""Persistent record of filter_btb decisions, used for resumable filtering.
+
+Each source file is keyed by its name and identified by (size, mtime, content
+hash). A file whose size and mtime are unchanged since its last decision is
+skipped without being read; a file that was touched but whose content hash is
+unchanged keeps its verdict. Only new or modified files are checked again.
+
+Each verdict also records a fingerprint of the settings that produced it
+(keywords, output mode): a file decided with other settings is checked again,
+whatever its stat.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+VERDICTS = ("included", "excluded", "no_match", "error")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    filename       TEXT PRIMARY KEY,
+    size           INTEGER NOT NULL,
+    mtime_ns       INTEGER NOT NULL,
+    sha256         TEXT,
+    verdict        TEXT NOT NULL,
+    inclusion_hits TEXT,
+    exclusion_hits TEXT,
+    error          TEXT,
+    checked_at     TEXT NOT NULL,
+    settings       TEXT
+)
+"""
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def settings_fingerprint(settings: dict) -> str:
+    """Short stable hash of the settings (JSON-serializable) of a filter run."""
+    encoded = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    return sha256_bytes(encoded.encode("utf-8"))[:16]
+
+
+class FilterManifest:
+    """SQLite table of per-file filter verdicts, made with the given settings."""
+
+    def __init__(self, path: str, settings: str = ""):
+        self.path = path
+        self.settings = settings
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(files)")}
+        if "settings" not in columns:
+            # Manifest written before settings were recorded: every row is
+            # checked again once
+            self.conn.execute("ALTER TABLE files ADD COLUMN settings TEXT")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def entries(self) -> dict:
+        """Map filename -> (size, mtime_ns, sha256, verdict, settings)."""
+        rows = self.conn.execute(
+            "SELECT filename, size, mtime_ns, sha256, verdict, settings FROM files"
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    def plan(self, source: str, filenames: list[str], retry_errors: bool = False):
+        """Split filenames into work to do.
+
+        Returns (to_check, known_hashes): the files that are new, whose size
+        or mtime changed or that were decided with other settings, and for
+        those already decided with the current settings, their recorded hash
+        so that a content-identical file can keep its verdict.
+        """
+        entries = self.entries()
+        to_check = []
+        known_hashes = {}
+        for filename in filenames:
+            entry = entries.get(filename)
+            if entry is None:
+                to_check.append(filename)
+                continue
+            size, mtime_ns, sha256, verdict, settings = entry
+            if settings != self.settings:
+                to_check.append(filename)
+                continue
+            stat = os.stat(os.path.join(source, filename))
+            unchanged = stat.st_size == size and stat.st_mtime_ns == mtime_ns
+            if unchanged and not (retry_errors and verdict == "error"):
+                continue
+            to_check.append(filename)
+            if sha256 and verdict != "error":
+                known_hashes[filename] = sha256
+        return to_check, known_hashes
+
+    def record(
+        self,
+        filename: str,
+        size: int,
+        mtime_ns: int,
+        sha256: str | None,
+        verdict: str,
+        inclusion_hits=(),
+        exclusion_hits=(),
+        error: str | None = None,
+    ):
+        if verdict not in VERDICTS:
+            raise ValueError(f"Invalid verdict '{verdict}'")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                filename,
+                size,
+                mtime_ns,
+                sha256,
+                verdict,
+                "|".join(inclusion_hits),
+                "|".join(exclusion_hits),
+                error,
+                datetime.now().isoformat(timespec="seconds"),
+                self.settings,
+            ),
+        )
+
+    def touch(self, filename: str, size: int, mtime_ns: int):
+        """Refresh the stat of a file whose content did not change."""
+        self.conn.execute(
+            "UPDATE files SET size = ?, mtime_ns = ? WHERE filename = ?",
+            (size, mtime_ns, filename),
+        )
+
+    def verdict(self, filename: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT verdict FROM files WHERE filename = ?", (filename,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def included(self) -> list[str]:
+        """Filenames currently kept by the filter, sorted."""
+        rows = self.conn.execute(
+            "SELECT filename FROM files WHERE verdict = 'included' ORDER BY filename"
+        )
+        return [row[0] for row in rows]
+
+    def commit(self):
+        self.conn.commit()
@@ -0,0 +1,152 @@
+"""Small helpers for running extraction steps concurrently."""
+
+import queue
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor
+
+
+def ordered_map(
+    executor: Executor,
+    fn: Callable,
+    items: Iterable,
+    max_pending: int,
+) -> Iterator[tuple]:
+    """Apply fn to items on executor, yielding (item, result) in input order.
+
+    At most max_pending tasks are submitted ahead of the consumer, so the
+    input iterable is consumed lazily and memory stays bounded even for very
+    long (or streamed) inputs. Exceptions raised by fn propagate when the
+    corresponding result is reached.
+    """
+    max_pending = max(1, max_pending)
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(fn, item)))
+        if len(pending) >= max_pending:
+            done_item, future = pending.popleft()
+            yield done_item, future.result()
+    while pending:
+        done_item, future = pending.popleft()
+        yield done_item, future.result()
+
+
+def prefetch(items: Iterable, max_pending: int) -> Iterator:
+    """Iterate items in a background thread, staying at most max_pending ahead.
+
+    Lets a slow producer (e.g. a database cursor) keep fetching while the
+    consumer works on earlier items, with bounded memory. Exceptions raised
+    by the producer propagate to the consumer. If the consumer stops early,
+    the producer is stopped at its next item.
+    """
+    buffer = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((False, item)):
+                    return
+            put((True, None))
+        except BaseException as e:
+            put((True, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            done, value = buffer.get()
+            if done:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+        thread.join()
+
+
+class ThreadSink:
+    """Hand items to worker threads running consume(item), with back-pressure.
+
+    put() blocks while the queued items weigh more than max_pending (by
+    weight(item), e.g. their size in bytes), so a fast producer cannot fill
+    the memory; an item heavier than the budget is still accepted once the
+    queue is empty. The first exception raised by consume is re-raised by
+    put() or close().
+    """
+
+    def __init__(
+        self,
+        consume: Callable,
+        workers: int,
+        max_pending: int,
+        weight: Callable = len,
+    ):
+        self.consume = consume
+        self.weight = weight
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.error = None
+        self._queue = queue.Queue()
+        self._budget = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            weight = self.weight(item)
+            try:
+                if self.error is None:
+                    self.consume(item)
+            except BaseException as e:
+                self.error = self.error or e
+            finally:
+                with self._budget:
+                    self.pending -= weight
+                    self._budget.notify_all()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def put(self, item):
+        weight = self.weight(item)
+        with self._budget:
+            while self.pending and self.pending + weight > self.max_pending:
+                self._raise_error()
+                self._budget.wait(timeout=0.1)
+            self._raise_error()
+            self.pending += weight
+        self._queue.put(item)
+
+    def close(self):
+        """Wait for every queued item to be consumed."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._raise_error()
@@ -1,78 +1,428 @@
-"""Convert PDF files to TXT using an external Java JAR tool.
+"""Convert PDF files to TXT.
+
+Two backends are available (PDF_TO_TEXT_BACKEND in config / --backend):
+    jar     -- external Java JAR tool (historical converter)
+    pymupdf -- in-process extraction with PyMuPDF, no JVM needed
+
+The JAR backend has two modes (PDF_TO_TEXT_MODE in config / --mode):
+    spawn      -- one ``java -jar`` process per PDF
+    persistent -- one long-lived JVM (PdfToTextServer.java) fed with PDF paths
+                  over stdin, which avoids paying JVM startup for every file
+
+Conversions can run concurrently (--workers N), each worker converting in
+its own scratch directory: JAR conversions on threads (the work happens in
+the JVMs), PyMuPDF conversions on processes (PyMuPDF is not thread-safe).
+
+Input PDFs are the *.pdf files (or links) of the source folder, plus the
+absolute paths listed in its btb_files.txt, written by filter_btb in
+"manifest" output mode.
 
 Usage:
-    python -m src.extraction.pdf_to_text
+    python -m src.extraction.pdf_to_text [--backend jar|pymupdf]
+                                         [--mode spawn|persistent] [--workers N]
+                                         [--input-list FILE]
 """
 
+import argparse
+import collections
 import logging
 import os
+import queue
 import shutil
 import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 
+import fitz  # PyMuPDF
 from tqdm import tqdm
 
 from src.config import (
     JAVA_PATH,
     JAR_PATH,
+    PDF_TO_TEXT_BACKEND,
+    PDF_TO_TEXT_MODE,
+    PDF_TO_TEXT_SERVER,
+    PDF_TO_TEXT_WORKERS,
     EXTRACT_FILTERED_BTB_DIR,
     EXTRACT_BTB_TXT_DIR,
 )
+from src.extraction.parallel import ordered_map
 
 log = logging.getLogger(__name__)
 
+# List of PDF paths written by filter_btb next to (or instead of) the PDFs
+INPUT_LIST_NAME = "btb_files.txt"
+
+BACKENDS = ("jar", "pymupdf")
+MODES = ("spawn", "persistent")
+
+# Per-document conversion timeout, in seconds
+CONVERSION_TIMEOUT = 60
+# Time allowed for a persistent JVM to compile the server and load the JAR
+STARTUP_TIMEOUT = 120
+# Last JVM stderr lines kept to explain a failure
+STDERR_TAIL_LINES = 20
+
+
+class ConversionError(Exception):
+    """The converter reported a failure for one document."""
+
+
+class ConverterExited(RuntimeError):
+    """The JAR called System.exit(): the persistent JVM cannot be reused."""
+
+
+def _txt_name(file_name: str) -> str:
+    return os.path.splitext(os.path.basename(file_name))[0] + ".txt"
+
+
+class SpawnConverter:
+    """Run ``java -jar`` once per document."""
+
+    def __init__(self, workdir: str = ".", timeout: int = CONVERSION_TIMEOUT):
+        self.workdir = workdir
+        self.timeout = timeout
+
+    def convert(self, file_path: str):
+        command = [JAVA_PATH, "-jar", str(JAR_PATH), os.path.abspath(file_path)]
+        result = subprocess.run(
+            command,
+            cwd=self.workdir,
+            capture_output=True,
+            text=True,
+            timeout=self.timeout,
+        )
+        if result.returncode != 0:
+            raise ConversionError(result.stderr)
+
+    def close(self):
+        pass
+
+
+def _pump_lines(stream, lines: queue.Queue):
+    """Forward protocol lines from the JVM stdout to a queue; None marks EOF."""
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if line == "READY" or line.startswith(("OK\t", "ERR\t", "EXIT\t")):
+            lines.put(line)
+    lines.put(None)
+
+
+def _pump_stderr(stream, tail: collections.deque):
+    """Log the JVM stderr (converter output, compiler errors), keeping a tail."""
+    for line in stream:
+        line = line.rstrip("\r\n")
+        tail.append(line)
+        log.debug("converter JVM: %s", line)
+
+
+class PersistentConverter:
+    """Feed PDF paths to a long-lived JVM running PdfToTextServer.java.
+
+    Timeouts and crashes are handled per document: the JVM is killed and a
+    fresh one is started lazily for the next document. A JAR that calls
+    System.exit() would need a new JVM for every file: ConverterExited is
+    raised instead, and the spawn mode must be used.
+    """
+
+    def __init__(self, workdir: str = ".", timeout: int = CONVERSION_TIMEOUT):
+        self.workdir = workdir
+        self.timeout = timeout
+        self.process = None
+        self.lines = None
+        self.stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+        self.stderr_thread = None
+
+    def _start(self):
+        if not PDF_TO_TEXT_SERVER.exists():
+            raise FileNotFoundError(f"Converter server not found: {PDF_TO_TEXT_SERVER}")
+        self.process = subprocess.Popen(
+            [JAVA_PATH, str(PDF_TO_TEXT_SERVER), str(JAR_PATH)],
+            cwd=self.workdir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+        )
+        self.lines = queue.Queue()
+        self.stderr_tail.clear()
+        threading.Thread(
+            target=_pump_lines, args=(self.process.stdout, self.lines), daemon=True
+        ).start()
+        self.stderr_thread = threading.Thread(
+            target=_pump_stderr,
+            args=(self.process.stderr, self.stderr_tail),
+            daemon=True,
+        )
+        self.stderr_thread.start()
+        try:
+            ready = self.lines.get(timeout=STARTUP_TIMEOUT)
+        except queue.Empty:
+            ready = None
+        if ready != "READY":
+            self._stop()
+            raise RuntimeError(f"Converter JVM failed to start{self._stderr()}")
+        log.debug("Converter JVM started (pid %d)", self.process.pid)
+
+    def _stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process = None
+        self.stderr_thread.join(timeout=1)
+
+    def _stderr(self) -> str:
+        """Last stderr lines of the JVM, formatted for an error message."""
+        lines = [line for line in self.stderr_tail if line.strip()]
+        return ": " + " | ".join(lines) if lines else ""
+
+    def _restart_later(self, reason: str):
+        log.warning("Restarting converter JVM: %s", reason)
+        self._stop()
+
+    def convert(self, file_path: str):
+        if self.process is None or self.process.poll() is not None:
+            self._stop()
+            self._start()
+
+        path = os.path.abspath(file_path)
+        try:
+            self.process.stdin.write(path + "\n")
+            self.process.stdin.flush()
+            line = self.lines.get(timeout=self.timeout)
+        except queue.Empty:
+            self._restart_later(f"timeout on {os.path.basename(path)}")
+            raise subprocess.TimeoutExpired(path, self.timeout)
+        except OSError:
+            line = None
+
+        if line is not None and line.startswith("EXIT\t"):
+            self._stop()
+            raise ConverterExited(
+                f"the JAR called System.exit() while converting "
+                f"{os.path.basename(path)}; persistent mode cannot reuse the JVM, "
+                f"use --mode spawn{self._stderr()}"
+            )
+        if line is None:
+            self._restart_later(f"JVM died on {os.path.basename(path)}")
+            raise ConversionError(f"converter JVM exited unexpectedly{self._stderr()}")
+
+        status, _, message = line.partition("\t")
+        if status != "OK":
+            raise ConversionError(message.partition("\t")[2] or line)
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+        self._stop()
+
+
+def extract_pdf_text(file_path: str) -> str:
+    """Extract the text of every page of a PDF with PyMuPDF."""
+    with fitz.open(file_path) as doc:
+        return join_pages(page.get_text() for page in doc)
+
+
+def join_pages(pages) -> str:
+    """Assemble per-page texts into the document text written to disk."""
+    return "\n".join(pages)
+
+
+class PyMuPDFConverter:
+    """Extract text in-process with PyMuPDF, mimicking the JAR's output layout."""
+
+    def __init__(self, workdir: str = "."):
+        self.workdir = workdir
+
+    def convert(self, file_path: str):
+        try:
+            text = extract_pdf_text(file_path)
+        except (RuntimeError, ValueError) as e:
+            raise ConversionError(str(e)) from e
+        txt_path = os.path.join(self.workdir, _txt_name(file_path))
+        with open(txt_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def close(self):
+        pass
+
+
+def make_converter(backend: str, mode: str, workdir: str = "."):
+    """Build a converter for the given backend and JAR mode."""
+    if backend == "pymupdf":
+        return PyMuPDFConverter(workdir)
+    if backend != "jar":
+        raise ValueError(
+            f"Invalid backend '{backend}'. Choose one of {', '.join(BACKENDS)}."
+        )
+    if mode == "spawn":
+        return SpawnConverter(workdir)
+    if mode == "persistent":
+        return PersistentConverter(workdir)
+    raise ValueError(f"Invalid mode '{mode}'. Choose one of {', '.join(MODES)}.")
+
+
+def list_input_pdfs(source: str, input_list: str | None = None) -> list[str]:
+    """Paths of the PDFs to convert, sorted by file name.
+
+    Combines the PDFs found in source with the paths listed in input_list
+    (default: source/btb_files.txt, if present).
+    """
+    paths = {
+        f: os.path.join(source, f) for f in os.listdir(source) if f.endswith(".pdf")
+    }
+    list_path = input_list or os.path.join(source, INPUT_LIST_NAME)
+    if os.path.exists(list_path):
+        with open(list_path, encoding="utf-8") as f:
+            for line in f:
+                path = line.strip()
+                if path:
+                    paths.setdefault(os.path.basename(path), path)
+    return [paths[name] for name in sorted(paths)]
+
+
+def _run_conversion(converter, output: str, pdf_path: str):
+    """Convert one PDF with converter and move its text file to output.
+
+    Returns a (status, message) pair, status being one of "converted",
+    "missing", "timeout", "failed" or "error".
+    """
+    try:
+        converter.convert(pdf_path)
+
+        txt_file_name = _txt_name(pdf_path)
+        source_txt_path = os.path.join(converter.workdir, txt_file_name)
+        if not os.path.exists(source_txt_path):
+            return "missing", None
+        shutil.move(source_txt_path, os.path.join(output, txt_file_name))
+        return "converted", None
+
+    except subprocess.TimeoutExpired:
+        return "timeout", None
+    except ConversionError as e:
+        return "failed", str(e)
+    except ConverterExited:
+        raise
+    except Exception as e:
+        return "error", str(e)
+
+
+def _convert_one(slots: queue.Queue, output: str, pdf_path: str):
+    """Convert one PDF with a free converter slot (worker threads)."""
+    converter = slots.get()
+    try:
+        return _run_conversion(converter, output, pdf_path)
+    finally:
+        slots.put(converter)
+
+
+def _convert_in_process(scratch: str, output: str, pdf_path: str):
+    """Convert one PDF with PyMuPDF in a worker process.
+
+    PyMuPDF is not thread-safe and holds the GIL while parsing, so its
+    conversions run on a process pool, each process in its own scratch
+    directory.
+    """
+    workdir = os.path.join(scratch, f"process_{os.getpid()}")
+    os.makedirs(workdir, exist_ok=True)
+    return _run_conversion(PyMuPDFConverter(workdir), output, pdf_path)
+
 
 def main(
     source_dir: str | None = None,
     output_dir: str | None = None,
+    mode: str | None = None,
+    workers: int | None = None,
+    backend: str | None = None,
+    input_list: str | None = None,
 ):
-    """Convert all PDFs in source_dir to TXT files in output_dir."""
+    """Convert all PDFs in source_dir (and input_list) to TXT files in output_dir.
+
+    With workers > 1, conversions run concurrently: on threads for the JAR
+    backend, on processes for PyMuPDF. Each worker owns a converter and a
+    scratch directory, so the JAR's "<name>.txt written in the current
+    directory" behaviour cannot collide between workers.
+    """
     source = source_dir or str(EXTRACT_FILTERED_BTB_DIR)
     output = output_dir or str(EXTRACT_BTB_TXT_DIR)
+    mode = mode or PDF_TO_TEXT_MODE
+    workers = max(1, workers or PDF_TO_TEXT_WORKERS)
+    backend = backend or PDF_TO_TEXT_BACKEND
 
     os.makedirs(source, exist_ok=True)
-    if not JAR_PATH.exists():
+    if backend == "jar" and not JAR_PATH.exists():
         raise FileNotFoundError(f"JAR file not found: {JAR_PATH}")
 
     os.makedirs(output, exist_ok=True)
 
-    pdf_files = [f for f in os.listdir(source) if f.endswith(".pdf")]
+    pdf_files = list_input_pdfs(source, input_list)
     log.info("Found %d PDF files in %s", len(pdf_files), source)
 
     # Skip already converted files
     existing_txt = set(
         os.path.splitext(f)[0] for f in os.listdir(output) if f.endswith(".txt")
     )
-    to_process = [f for f in pdf_files if os.path.splitext(f)[0] not in existing_txt]
+    to_process = [
+        f
+        for f in pdf_files
+        if os.path.splitext(os.path.basename(f))[0] not in existing_txt
+    ]
     log.info(
-        "Already converted: %d, remaining: %d",
+        "Already converted: %d, remaining: %d (%d worker(s), %s backend)",
         len(pdf_files) - len(to_process),
         len(to_process),
+        workers,
+        backend if backend != "jar" else f"jar/{mode}",
     )
 
     converted = 0
-    for file_name in tqdm(to_process, desc="PDF -> TXT"):
-        file_path = os.path.join(source, file_name)
+    # Scratch directories live in output so the final move is a rename
+    with tempfile.TemporaryDirectory(prefix=".pdf_to_text_", dir=output) as scratch:
+        slots = queue.Queue()
+        if backend == "pymupdf" and workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            convert = partial(_convert_in_process, scratch, output)
+        else:
+            for i in range(workers):
+                workdir = os.path.join(scratch, f"worker_{i}")
+                os.makedirs(workdir)
+                slots.put(make_converter(backend, mode, workdir))
+            executor = ThreadPoolExecutor(max_workers=workers)
+            convert = partial(_convert_one, slots, output)
+
         try:
-            command = [JAVA_PATH, "-jar", str(JAR_PATH), file_path]
-            result = subprocess.run(command, capture_output=True, text=True, timeout=60)
-
-            if result.returncode == 0:
-                txt_file_name = os.path.splitext(file_name)[0] + ".txt"
-                source_txt_path = os.path.join(".", txt_file_name)
-                dest_txt_path = os.path.join(output, txt_file_name)
-
-                if os.path.exists(source_txt_path):
-                    shutil.move(source_txt_path, dest_txt_path)
-                    converted += 1
-                else:
-                    log.warning("No output file for: %s", file_name)
-            else:
-                log.error("Conversion failed for %s: %s", file_name, result.stderr)
-
-        except subprocess.TimeoutExpired:
-            log.warning("Timeout processing %s", file_name)
-        except Exception as e:
-            log.error("Error processing %s: %s", file_name, e)
+            with executor:
+                results = ordered_map(
+                    executor, convert, to_process, max_pending=2 * workers
+                )
+                for pdf_path, (status, message) in tqdm(
+                    results, total=len(to_process), desc="PDF -> TXT"
+                ):
+                    file_name = os.path.basename(pdf_path)
+                    if status == "converted":
+                        converted += 1
+                    elif status == "missing":
+                        log.warning("No output file for: %s", file_name)
+                    elif status == "timeout":
+                        log.warning("Timeout processing %s", file_name)
+                    elif status == "failed":
+                        log.error("Conversion failed for %s: %s", file_name, message)
+                    else:
+                        log.error("Error processing %s: %s", file_name, message)
+        finally:
+            while not slots.empty():
+                slots.get().close()
 
     log.info(
         "Conversion done: %d/%d new files converted to %s",
@@ -87,4 +437,34 @@ if __name__ == "__main__":
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     )
-    main()
+    parser = argparse.ArgumentParser(description="Convert PDF files to TXT.")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=PDF_TO_TEXT_BACKEND,
+        help="jar: external Java tool, pymupdf: in-process extraction",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default=PDF_TO_TEXT_MODE,
+        help="spawn: one JVM per PDF, persistent: long-lived JVM",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=PDF_TO_TEXT_WORKERS,
+        help="Number of concurrent conversions",
+    )
+    parser.add_argument(
+        "--input-list",
+        default=None,
+        help=f"File listing PDF paths (default: <source>/{INPUT_LIST_NAME})",
+    )
+    args = parser.parse_args()
+    main(
+        mode=args.mode,
+        workers=args.workers,
+        backend=args.backend,
+        input_list=args.input_list,
+    )
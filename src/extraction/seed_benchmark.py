@@ -0,0 +1,227 @@
+"""Fill the SQLite database of the "sqlite" backend with synthetic documents.
+
+Creates DB_SQLITE_PATH with the tables read by db_easily (patients, anapath
+documents and their PDF BLOBs) and db_archemed (HTML documents), plus a
+transplants CSV listing the synthetic patients. With DB_BACKEND=sqlite and
+TRANSPLANTS_CSV pointing to that CSV, both extraction steps run offline,
+e.g. to measure fetch sizes, writer threads and memory:
+
+    DATA_DIR=data_benchmark DB_BACKEND=sqlite
+    TRANSPLANTS_CSV=data_benchmark/transplants.csv
+    python -m src.extraction.seed_benchmark --patients 1000 --pdf-kb 300
+    python -m src.extraction.db_easily --writers 8 --fetch-size 100
+
+PDFs are real (one text page, padded to the requested size with an embedded
+file) and a share of them are BTB reports, so the later steps can run too.
+Some Easily documents reuse the content of an earlier one and some ARCHEMED
+rows are repeated, as in the production data.
+
+Usage:
+    python -m src.extraction.seed_benchmark [--patients 500] [--documents 4]
+                                            [--pdf-kb 200] [--btb-rate 0.3]
+                                            [--duplicate-rate 0.05] [--seed 0]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sqlite3
+from datetime import date, datetime, timedelta
+from html import escape
+
+import fitz  # PyMuPDF
+from tqdm import tqdm
+
+from src.config import DB_SQLITE_PATH
+from src.extraction.db_backend import create_sqlite_schema
+
+log = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 200
+FIRST_DATE = date(2015, 1, 1)
+DATE_RANGE_DAYS = 10 * 365
+
+BTB_REPORT = """Compte rendu anatomopathologique
+IPP : {ipp}
+Date de prelevement : {date}
+Nature du prelevement : biopsies transbronchiques
+Technique : {fragments} fragments, coupes a 3 niveaux
+Colorations : HES, trichrome de Masson
+Description : parenchyme pulmonaire alveole sans infiltrat perivasculaire.
+Conclusion : absence de rejet aigu (A0 B0), absence de bronchiolite.
+Reference : {reference}"""
+
+OTHER_REPORT = """Compte rendu anatomopathologique
+IPP : {ipp}
+Date de prelevement : {date}
+Nature du prelevement : lavage bronchoalveolaire
+Description : liquide de lavage, formule cellulaire normale.
+Conclusion : absence d'element suspect.
+Reference : {reference}"""
+
+
+def report_text(rng: random.Random, ipp: str, day: date, reference: str, btb: bool):
+    template = BTB_REPORT if btb else OTHER_REPORT
+    return template.format(
+        ipp=ipp,
+        date=day.strftime("%d/%m/%Y"),
+        fragments=rng.randint(3, 8),
+        reference=reference,
+    )
+
+
+def make_pdf(text: str, padding: bytes) -> bytes:
+    """One-page PDF with text, padded with an embedded file."""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((50, 72), text, fontsize=10)
+    if padding:
+        doc.embfile_add("scan.bin", padding)
+    data = doc.tobytes(deflate=True)
+    doc.close()
+    return data
+
+
+def make_html(text: str) -> str:
+    """ARCHEMED-like HTML for a report."""
+    lines = "".join(f"<p>{escape(line)}</p>\n" for line in text.splitlines())
+    head = "<head><style>p {margin: 0}</style></head>"
+    return f"<html>{head}<body>\n{lines}</body></html>"
+
+
+def seed(
+    path: str,
+    transplants_csv: str,
+    patients: int = 500,
+    documents: int = 4,
+    pdf_kb: int = 200,
+    btb_rate: float = 0.3,
+    duplicate_rate: float = 0.05,
+    seed_value: int = 0,
+):
+    """Create the SQLite database and the transplants CSV."""
+    rng = random.Random(seed_value)
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    create_sqlite_schema(conn)
+
+    ipps = [f"80{n:08d}" for n in range(1, patients + 1)]
+    conn.executemany(
+        "INSERT INTO noyau_patient VALUES (?, ?)",
+        [(pat_id, ipp) for pat_id, ipp in enumerate(ipps, 1)],
+    )
+    conn.executemany(
+        "INSERT INTO dwh_patient_ipphist VALUES (?, ?)",
+        [(100000 + pat_id, ipp) for pat_id, ipp in enumerate(ipps, 1)],
+    )
+
+    doc_id = 0
+    total_bytes = 0
+    blobs = []
+    pending_files, pending_docs, pending_html = [], [], []
+
+    def flush():
+        conn.executemany("INSERT INTO stockage_files VALUES (?, ?)", pending_files)
+        conn.executemany(
+            "INSERT INTO metadone_documents VALUES (?, ?, ?, ?, ?, ?)", pending_docs
+        )
+        conn.executemany(
+            "INSERT INTO dwh_document VALUES (?, ?, ?, ?, ?, ?)", pending_html
+        )
+        pending_files.clear()
+        pending_docs.clear()
+        pending_html.clear()
+
+    for pat_id, ipp in enumerate(tqdm(ipps, desc="Seeding", unit="patient"), 1):
+        for _ in range(documents):
+            doc_id += 1
+            day = FIRST_DATE + timedelta(days=rng.randrange(DATE_RANGE_DAYS))
+            created = datetime.combine(day, datetime.min.time()) + timedelta(
+                hours=rng.randint(8, 18)
+            )
+            btb = rng.random() < btb_rate
+            text = report_text(rng, ipp, day, f"AP{doc_id:08d}", btb)
+
+            if blobs and rng.random() < duplicate_rate:
+                fil_data = rng.choice(blobs)
+            else:
+                fil_data = make_pdf(text, rng.randbytes(pdf_kb * 1024))
+                if len(blobs) < 100:
+                    blobs.append(fil_data)
+            total_bytes += len(fil_data)
+            pending_files.append((doc_id, fil_data))
+            pending_docs.append((doc_id, pat_id, "Anapath", created, created, doc_id))
+
+            row = (100000 + pat_id, f"{doc_id}", "EXT", "Anapath", day, make_html(text))
+            pending_html.append(row)
+            if rng.random() < duplicate_rate:
+                pending_html.append(row)
+
+        # Other documents, excluded by the queries
+        doc_id += 1
+        pending_files.append((doc_id, make_pdf("Courrier", b"")))
+        pending_docs.append((doc_id, pat_id, "Courrier", None, None, doc_id))
+        pending_html.append(
+            (100000 + pat_id, f"{doc_id}", "EXT", "Courrier", None, "<p>Courrier</p>")
+        )
+        if len(pending_docs) >= INSERT_BATCH_SIZE:
+            flush()
+    flush()
+    conn.commit()
+    conn.close()
+
+    with open(transplants_csv, "w", encoding="latin-1") as f:
+        f.write("NIP\n")
+        f.writelines(f"{ipp}\n" for ipp in ipps)
+
+    log.info(
+        "Seeded %s: %d patients, %d anapath PDFs (%.1f MB)",
+        path,
+        patients,
+        patients * documents,
+        total_bytes / 1024 / 1024,
+    )
+    log.info(
+        "Run the extraction with DB_BACKEND=sqlite TRANSPLANTS_CSV=%s", transplants_csv
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Seed the benchmark SQLite database.")
+    parser.add_argument("--patients", type=int, default=500, help="Number of patients")
+    parser.add_argument(
+        "--documents", type=int, default=4, help="Anapath documents per patient"
+    )
+    parser.add_argument("--pdf-kb", type=int, default=200, help="Size of each PDF")
+    parser.add_argument("--btb-rate", type=float, default=0.3, help="Share of BTB reports")
+    parser.add_argument(
+        "--duplicate-rate",
+        type=float,
+        default=0.05,
+        help="Share of documents repeating an earlier content",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--transplants",
+        default=None,
+        help="CSV of patients to write (default: next to the database)",
+    )
+    args = parser.parse_args()
+    db_path = str(DB_SQLITE_PATH)
+    seed(
+        db_path,
+        args.transplants or os.path.join(os.path.dirname(db_path), "transplants.csv"),
+        patients=args.patients,
+        documents=args.documents,
+        pdf_kb=args.pdf_kb,
+        btb_rate=args.btb_rate,
+        duplicate_rate=args.duplicate_rate,
+        seed_value=args.seed,
+    )
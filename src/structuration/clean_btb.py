@@ -25,6 +25,12 @@ ENTETE_HOPITAL_FOCH = (
     r"Fax\s*:\s*01[\s.]46[\s.]25[\s.]26[\s.]45"
 )
 
+# -- Name cleaning -------------------------------------------------------------
+LEADING_PR_RE = re.compile(r"^Pr\s+", re.IGNORECASE)
+INNER_PR_RE = re.compile(r"\s+Pr\s+", re.IGNORECASE)
+TRAILING_PR_RE = re.compile(r"\s+Pr$", re.IGNORECASE)
+WHITESPACE_RE = re.compile(r"\s+")
+
 
 def convert_to_date(text):
     """Convert DD/MM/YYYY string to datetime for Excel."""
@@ -44,10 +50,10 @@ def clean_nom(text):
         return None
     text = str(text)
     text = text.replace("Destinataire", "")
-    text = re.sub(r"^Pr\s+", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\s+Pr\s+", " ", text, flags=re.IGNORECASE)
-    text = re.sub(r"\s+Pr$", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"\s+", " ", text).strip()
+    text = LEADING_PR_RE.sub("", text)
+    text = INNER_PR_RE.sub(" ", text)
+    text = TRAILING_PR_RE.sub("", text)
+    text = WHITESPACE_RE.sub(" ", text).strip()
     return text
 
 
@@ -0,0 +1,116 @@
+"""Per-document index used to resolve field patterns without full scans.
+
+A document is normalized once: case-folded the way re.IGNORECASE compares
+characters, without changing its length, so a position found in the folded
+text is the same position in the original and every value is still taken
+from the original text by the unchanged patterns.
+
+Every match of a field pattern starts with one of its keys, the first word
+of the field's label (see patterns.compile_patterns). DocumentIndex resolves
+a field by trying its pattern only at the occurrences of those keys, in
+order, which gives the same match as regex.search(text). A field is skipped
+outright when the document contains none of its anchors, literals found in
+every match (the keys unless the pattern lists its own). Fields without
+keys fall back to regex.search.
+
+The same index serves the section lookups of extractors (technique, levels
+of cuts, model detection): positions of words and of section titles are
+computed once per document and shared by every function asking for them.
+"""
+
+from bisect import bisect_left, bisect_right
+
+# Characters matched by re.IGNORECASE that str.lower() does not fold to the
+# same single character (dotted / dotless i, long s)
+FOLD_FIXES = {"İ": "i", "ı": "i", "ſ": "s"}
+FOLD_TABLE = str.maketrans(FOLD_FIXES)
+
+
+def fold(text: str) -> str:
+    """Lowercase text as re.IGNORECASE compares it, keeping offsets."""
+    if any(c in text for c in FOLD_FIXES):
+        text = text.translate(FOLD_TABLE)
+    return text.lower()
+
+
+class DocumentIndex:
+    """Case-folded text of one document, with positions computed on demand."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.folded = fold(text)
+        # anchor -> whether the folded text contains it
+        self._anchors = {}
+        # (word, cased) -> sorted positions; regex -> [(start, end)]
+        self._positions = {}
+        self._spans = {}
+
+    def contains_any(self, anchors: tuple) -> bool:
+        """Whether the folded text contains at least one of anchors."""
+        for anchor in anchors:
+            found = self._anchors.get(anchor)
+            if found is None:
+                found = self._anchors[anchor] = anchor in self.folded
+            if found:
+                return True
+        return False
+
+    def positions(self, word: str, cased: bool = False) -> list[int]:
+        """Sorted positions of word in the folded text (the text if cased)."""
+        found = self._positions.get((word, cased))
+        if found is None:
+            text = self.text if cased else self.folded
+            found = []
+            i = text.find(word)
+            while i != -1:
+                found.append(i)
+                i = text.find(word, i + 1)
+            self._positions[word, cased] = found
+        return found
+
+    def occurrences(self, keys: tuple, start: int = 0) -> list[int]:
+        """Sorted positions of keys in the folded text, from start."""
+        positions = set()
+        for key in keys:
+            found = self.positions(key)
+            positions.update(found[bisect_left(found, start):])
+        return sorted(positions)
+
+    def spans(self, regex, keys: tuple) -> list[tuple[int, int]]:
+        """(start, end) of the matches of regex at the occurrences of keys."""
+        found = self._spans.get(regex)
+        if found is None:
+            found = []
+            for position in self.occurrences(keys):
+                match = regex.match(self.text, position)
+                if match:
+                    found.append((position, match.end()))
+            self._spans[regex] = found
+        return found
+
+    def first_after(self, positions: list[int], start: int) -> int | None:
+        """First of the sorted positions at or after start."""
+        i = bisect_left(positions, start)
+        return positions[i] if i < len(positions) else None
+
+    def between(self, positions: list[int], start: int, end: int) -> list[int]:
+        """Sorted positions from start to end, both included."""
+        return positions[bisect_left(positions, start):bisect_right(positions, end)]
+
+    def find(self, regex, keys: tuple, start: int = 0):
+        """Same match as regex.search(text, start) if matches start with keys."""
+        for position in self.occurrences(keys, start):
+            match = regex.match(self.text, position)
+            if match:
+                return match
+        return None
+
+    def search(self, item: dict):
+        """Same match as item["regex"].search(text), from the key positions."""
+        regex = item["regex"]
+        anchors = item.get("anchors")
+        if anchors and not self.contains_any(anchors):
+            return None
+        if not item.get("keys"):
+            return regex.search(self.text)
+        return self.find(regex, item["keys"])
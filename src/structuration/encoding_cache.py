@@ -0,0 +1,78 @@
+"""Persistent record of the encoding of each text file, used by read_text_file.
+
+Each file is keyed by its absolute path and identified by (size, mtime). A
+file whose size and mtime are unchanged since it was last read is decoded
+with the recorded encoding, without running the detection again; new or
+modified files are detected and recorded.
+"""
+
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    encoding    TEXT NOT NULL,
+    detected_at TEXT NOT NULL
+)
+"""
+
+COMMIT_EVERY = 200
+
+
+class EncodingCache:
+    """SQLite table of per-file encodings."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        try:
+            self.conn.execute(SCHEMA)
+            # Fail here rather than at the first commit if it cannot be written
+            self.conn.execute("DELETE FROM files WHERE size < 0")
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+        self._pending = 0
+        rows = self.conn.execute("SELECT path, size, mtime_ns, encoding FROM files")
+        self._entries = {row[0]: row[1:] for row in rows}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: str, size: int, mtime_ns: int) -> str | None:
+        """Recorded encoding of path, if the file is unchanged since."""
+        entry = self._entries.get(path)
+        if entry is None or entry[:2] != (size, mtime_ns):
+            return None
+        return entry[2]
+
+    def record(self, path: str, size: int, mtime_ns: int, encoding: str):
+        self._entries[path] = (size, mtime_ns, encoding)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+            (
+                path,
+                size,
+                mtime_ns,
+                encoding,
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.conn.commit()
+            self._pending = 0
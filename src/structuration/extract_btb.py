@@ -7,11 +7,14 @@ Usage:
 import argparse
 import logging
 import os
+import sqlite3
 
 import pandas as pd
 from tqdm import tqdm
 
 from src.config import OUTPUT_DIR, EXTRACT_FILTERED_BTB_DIR, EXTRACT_BTB_TXT_DIR
+from src.structuration.document_index import DocumentIndex
+from src.structuration.encoding_cache import EncodingCache
 from src.structuration.extractors import (
     extract_information,
     extract_niveaux_coupes,
@@ -23,10 +26,26 @@ from src.structuration.extractors import (
     read_text_file,
     remove_illegal_chars,
 )
-from src.structuration.patterns import ALL_PATTERNS, COLUMN_ORDER
+from src.structuration.patterns import COLUMN_ORDER, PATTERN_REGISTRY
 
 log = logging.getLogger(__name__)
 
+# Encodings of the files already read (see encoding_cache.py), stored in
+# OUTPUT_DIR so that reruns skip the detection; the input folder may be
+# read-only
+ENCODING_CACHE_NAME = "encodings.sqlite"
+
+
+def _open_encoding_cache() -> EncodingCache | None:
+    """The encoding cache, or None (no cache) if it cannot be written."""
+    cache_path = OUTPUT_DIR / ENCODING_CACHE_NAME
+    try:
+        os.makedirs(str(OUTPUT_DIR), exist_ok=True)
+        return EncodingCache(str(cache_path))
+    except (OSError, sqlite3.Error) as e:
+        log.warning("Encoding cache disabled, %s not writable: %s", cache_path, e)
+        return None
+
 
 def process_text_files(directory_path: str) -> pd.DataFrame:
     """Process all .txt files in a directory and extract BTB information."""
@@ -35,32 +54,44 @@ def process_text_files(directory_path: str) -> pd.DataFrame:
     log.info("Found %d .txt files in %s", len(txt_files), directory_path)
 
     errors = []
-    pbar = tqdm(txt_files, desc="Extracting BTB", unit="file")
-    for filename in pbar:
-        pbar.set_postfix_str(filename[:40], refresh=False)
-        file_path = os.path.join(directory_path, filename)
-        try:
-            text = read_text_file(file_path)
-
-            info = extract_information(text, ALL_PATTERNS)
-            info["Technique"] = extract_technique(text, option="lba")
-            info["Prescripteur"] = extract_prescripteur(text)
-            info["Prénom"] = extract_prenom_before_docteur(text)
-            info["Filename"] = filename
-            info["IPP"] = filename.split("_")[0]
-            info["Niveaux de coupes"] = extract_niveaux_coupes(text)
-
-            date_prelev = info.get("Date de prélèvement")
-            info["Modele_BTB"] = detect_modele_btb(text, date_prelev)
-            info["Texte_libre_complet"] = extract_texte_libre_complet(
-                text, info["Modele_BTB"]
+    encodings = _open_encoding_cache()
+    known = len(encodings) if encodings is not None else 0
+    try:
+        pbar = tqdm(txt_files, desc="Extracting BTB", unit="file")
+        for filename in pbar:
+            pbar.set_postfix_str(filename[:40], refresh=False)
+            file_path = os.path.join(directory_path, filename)
+            try:
+                text = read_text_file(file_path, encodings)
+
+                index = DocumentIndex(text)
+                info = extract_information(text, PATTERN_REGISTRY, index=index)
+                info["Technique"] = extract_technique(text, option="lba", index=index)
+                info["Prescripteur"] = extract_prescripteur(text)
+                info["Prénom"] = extract_prenom_before_docteur(text)
+                info["Filename"] = filename
+                info["IPP"] = filename.split("_")[0]
+                info["Niveaux de coupes"] = extract_niveaux_coupes(text, index=index)
+
+                date_prelev = info.get("Date de prélèvement")
+                info["Modele_BTB"] = detect_modele_btb(text, date_prelev, index=index)
+                info["Texte_libre_complet"] = extract_texte_libre_complet(
+                    text, info["Modele_BTB"]
+                )
+
+                data.append(info)
+            except Exception as e:
+                log.warning("Skipping %s: %s", filename, e)
+                errors.append(filename)
+                continue
+    finally:
+        if encodings is not None:
+            log.info(
+                "Encodings recorded for %d files (%d from earlier runs)",
+                len(encodings),
+                known,
             )
-
-            data.append(info)
-        except Exception as e:
-            log.warning("Skipping %s: %s", filename, e)
-            errors.append(filename)
-            continue
+            encodings.close()
 
     if errors:
         log.warning("%d files skipped due to errors", len(errors))
@@ -1,36 +1,192 @@
-"""Shared text extraction functions for BTB/LBA documents."""
+"""Shared text extraction functions for BTB/LBA documents.
 
+All regexes are compiled once at import: field patterns come from
+patterns.PATTERN_REGISTRY, the others are defined below.
+"""
+
+import codecs
 import logging
+import os
 import re
 from datetime import datetime
 
 import chardet
 
+from src.structuration.document_index import DocumentIndex
+from src.structuration.encoding_cache import EncodingCache
+from src.structuration.patterns import compile_patterns
+
 log = logging.getLogger(__name__)
 
+# -- Prescripteur --------------------------------------------------------------
+DOCTEUR_RE = re.compile(r"Docteur\s+([^\n]{1,120})")
+COMPTE_RENDU_AFTER_RE = re.compile(r"\s*,\s*Compte-rendu")
+ADICAP_AFTER_RE = re.compile(r"\s*\n\s*ADICAP")
+DATE_AFTER_RE = re.compile(r"\s*\n[\s\S]{0,40}\d{2}/\d{2}/\d{4}")
+NAME_TRAILER_RE = re.compile(r"[\s\.\-]+$")
+
+# -- Prenom --------------------------------------------------------------------
+PRENOM_RE = re.compile(r"Prénom\s*:\s*([A-Z\s]+)", re.IGNORECASE)
+
+# -- Technique -----------------------------------------------------------------
+# Section titles, per option, with the case-folded words they start with
+BTB_TITLE = (
+    r"(?:Biopsies\s+trans[ -]*bronchiques|Biopsies\s+transbronchiques"
+    r"|Biospies\s+transbronchiques|BTB)"
+)
+BTB_TITLE_RE = re.compile(BTB_TITLE, re.IGNORECASE)
+BTB_CASED_TITLE_RE = re.compile(BTB_TITLE)
+BTB_TITLE_KEYS = ("biopsies", "biospies", "btb")
+LBA_TITLE = r"(?:Lavage\s+bronchoalvéolaire|Lavage\s+broncho-alvéolaire|LBA)"
+LBA_TITLE_RE = re.compile(LBA_TITLE, re.IGNORECASE)
+LBA_TITLE_KEYS = ("lavage", "lba")
+# Numbered titles ("2. Biopsies transbronchiques"); numbers are 2-3 chars
+BTB_NUMBERED_RE = re.compile(
+    rf"(?:2\.|II\.|I\.|2/|2°/)[\s+]*{BTB_TITLE}", re.IGNORECASE
+)
+LBA_NUMBERED_RE = re.compile(rf"(?:1\.|I\.|1/|1°/)[\s+]*{LBA_TITLE}", re.IGNORECASE)
+NUMBER_LENGTHS = (3, 2)
+# The "Technique :" of a section is looked for in the SECTION_WINDOW
+# characters following its title, and before the title of the other section
+SECTION_WINDOW = 3000
+# Per option: numbered title, title, title keys, other section, mention
+TECHNIQUE_SECTIONS = {
+    "btb": (BTB_NUMBERED_RE, BTB_TITLE_RE, BTB_TITLE_KEYS, "lavage", "HES"),
+    "lba": (
+        LBA_NUMBERED_RE,
+        LBA_TITLE_RE,
+        LBA_TITLE_KEYS,
+        "biopsie",
+        "cytocentrifugation",
+    ),
+}
+TECHNIQUE_LINE_RE = re.compile(
+    r"Technique[^\S\r\n]*:[^\S\r\n]*([^;]+)", re.IGNORECASE | re.DOTALL
+)
+TECHNIQUE_ANY_RE = re.compile(r"Technique\s*:\s*([^;]+)", re.IGNORECASE | re.DOTALL)
+TECHNIQUE_CASED_RE = re.compile(r"Technique\s*:\s*([^;]+)", re.DOTALL)
+TECHNIQUE_KEYS = ("technique",)
+
+# -- Niveaux de coupes ---------------------------------------------------------
+NIVEAUX_DIRECT_RE = re.compile(
+    r"Technique\s*:\s*HES\s*;\s*(\d+)\s*niveaux?\s*de\s*coupes?", re.IGNORECASE
+)
+NIVEAUX_ANY_RE = re.compile(r"(\d+)\s*niveaux?\s*de\s*coupes?", re.IGNORECASE)
+TECHNIQUE_COLON_RE = re.compile(r"Technique\s*:", re.IGNORECASE)
+TECHNIQUE_TWO_PARTS_ANY_RE = re.compile(
+    r"Technique\s*:\s*([^;]+);\s*([^n]+)", re.IGNORECASE | re.DOTALL
+)
+TECHNIQUE_TWO_PARTS_RE = re.compile(r"Technique\s*:\s*([^;]+);\s*([^n]+)", re.DOTALL)
+
+# -- Modele BTB ----------------------------------------------------------------
+# A document matching at least STRUCTURED_MIN of these is semi-structured;
+# each pattern comes with the case-folded word its matches start with
+STRUCTURED_PATTERNS = [
+    ((key,), re.compile(pattern, re.IGNORECASE))
+    for key, pattern in (
+        ("site", r"Site\s*:"),
+        ("infiltrat", r"Infiltrat\s*mononucléé"),
+        ("bronchiolite", r"Bronchiolite\s*lymphocytaire"),
+        ("nombre", r"Nombre\s*de\s*fragments?\s*alvéolaires?"),
+        ("rejet", r"Rejet\s*cellulaire\s*:"),
+        ("rejet", r"Rejet\s*chronique\s*:"),
+        ("atteinte", r"Atteinte\s*du\s*compartiment"),
+        ("pnn", r"PNN\s*dans\s*les\s*cloisons"),
+        ("bronchiolite", r"Bronchiolite\s*oblitérante\s*\("),
+    )
+]
+STRUCTURED_MIN = 3
+
+# -- Encoding ------------------------------------------------------------------
+# Only the first DETECT_BYTES are fed to chardet: enough for reliable
+# detection and avoids very slow analysis on large files.
+DETECT_BYTES = 10_000
+# Bytes that make chardet consider escape-based or UTF-16/32 encodings
+DETECT_ESCAPES = (b"\x00", b"\x1b", b"~{")
+# chardet reports valid UTF-8 without further analysis once it has read this
+# many multibyte characters
+UTF8_SHORTCUT_CHARS = 6
+UTF8_LEAD_BYTES = bytes(range(0xC0, 0x100))
+FALLBACK_ENCODINGS = ("iso-8859-1", "utf-8", "latin-1", "cp1252")
+
+# -- Cleaning ------------------------------------------------------------------
+HORIZONTAL_SPACE_RE = re.compile(r"[ \t]+")
+BLANK_LINES_RE = re.compile(r"\n\s*\n")
+ILLEGAL_CHARS_RE = re.compile(r"[\x00-\x1F\x7F]")
+
+
+def fast_decode(raw: bytes) -> tuple[str, str] | None:
+    """Decode raw without chardet when its answer is known in advance.
+
+    Returns (text, encoding) for content whose decoding does not depend on
+    chardet's guess: a UTF-8 BOM, pure ASCII (every ASCII-compatible guess
+    decodes it the same way) and valid UTF-8 with enough multibyte
+    characters in the detected bytes. Returns None otherwise.
+    """
+    head = raw[:DETECT_BYTES]
+    if head.startswith(codecs.BOM_UTF8):
+        try:
+            return raw.decode("utf-8-sig"), "utf-8-sig"
+        except UnicodeDecodeError:
+            return None
+    if any(escape in head for escape in DETECT_ESCAPES):
+        return None
+    if raw.isascii():
+        return raw.decode("ascii"), "ascii"
+    # One more lead byte, as the last character may be cut at DETECT_BYTES
+    multibyte = len(head) - len(head.translate(None, UTF8_LEAD_BYTES))
+    if multibyte <= UTF8_SHORTCUT_CHARS:
+        return None
+    try:
+        return raw.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        return None
 
-def read_text_file(file_path: str) -> str:
-    """Read a text file with encoding auto-detection via chardet."""
-    with open(file_path, "rb") as f:
-        raw_data = f.read()
 
-    # Only feed the first 10 KB to chardet – enough for reliable detection
-    # and avoids very slow analysis on large files.
-    detected = chardet.detect(raw_data[:10_000])
-    encoding = detected.get("encoding") or "utf-8"
+def decode_text(raw: bytes) -> tuple[str, str]:
+    """Decode raw with the encoding detected by chardet, or a fallback.
 
-    try:
-        return raw_data.decode(encoding)
-    except (UnicodeDecodeError, LookupError):
-        pass
+    Returns (text, encoding). The fast path of fast_decode is tried first.
+    """
+    decoded = fast_decode(raw)
+    if decoded is not None:
+        return decoded
+
+    detected = chardet.detect(raw[:DETECT_BYTES])
+    encoding = detected.get("encoding") or "utf-8"
 
-    for fallback in ("iso-8859-1", "utf-8", "latin-1", "cp1252"):
+    for candidate in (encoding, *FALLBACK_ENCODINGS):
         try:
-            return raw_data.decode(fallback)
+            return raw.decode(candidate), candidate
         except (UnicodeDecodeError, LookupError):
             continue
 
-    return raw_data.decode("utf-8", errors="replace")
+    return raw.decode("utf-8", errors="replace"), "utf-8"
+
+
+def read_text_file(file_path: str, encodings: EncodingCache | None = None) -> str:
+    """Read a text file with encoding auto-detection via chardet.
+
+    With encodings, the encoding of a file already read and unchanged since
+    is taken from the cache, and the one detected for other files recorded.
+    """
+    with open(file_path, "rb") as f:
+        raw_data = f.read()
+        stat = os.fstat(f.fileno())
+
+    path = os.path.abspath(file_path)
+    if encodings is not None:
+        encoding = encodings.get(path, stat.st_size, stat.st_mtime_ns)
+        if encoding is not None:
+            try:
+                return raw_data.decode(encoding)
+            except (UnicodeDecodeError, LookupError):
+                pass
+
+    text, encoding = decode_text(raw_data)
+    if encodings is not None:
+        encodings.record(path, stat.st_size, stat.st_mtime_ns, encoding)
+    return text
 
 
 def extract_prescripteur(text: str) -> str | None:
@@ -42,23 +198,22 @@ def extract_prescripteur(text: str) -> str | None:
       - a date dd/mm/yyyy
     Uses a two-step approach to avoid catastrophic regex backtracking.
     """
-    for m in re.finditer(r"Docteur\s+([^\n]{1,120})", text):
+    for m in DOCTEUR_RE.finditer(text):
         name = m.group(1).strip()
         # Check the text immediately after the match (same line + next lines)
         after = text[m.end():m.end() + 200]
-        if (re.match(r"\s*,\s*Compte-rendu", after)
-                or re.match(r"\s*\n\s*ADICAP", after)
-                or re.match(r"\s*\n[\s\S]{0,40}\d{2}/\d{2}/\d{4}", after)):
+        if (COMPTE_RENDU_AFTER_RE.match(after)
+                or ADICAP_AFTER_RE.match(after)
+                or DATE_AFTER_RE.match(after)):
             # Strip trailing whitespace/punctuation from name
-            name = re.sub(r"[\s\.\-]+$", "", name)
+            name = NAME_TRAILER_RE.sub("", name)
             return name
     return None
 
 
 def extract_prenom_before_docteur(text: str) -> str | None:
     """Extract the first name from the 'Prenom:' field."""
-    pattern = r"Prénom\s*:\s*([A-Z\s]+)"
-    match = re.search(pattern, text, re.IGNORECASE)
+    match = PRENOM_RE.search(text)
     if match:
         before_docteur = match.group(1)
         first_name = before_docteur.split()[0] if before_docteur else None
@@ -66,94 +221,147 @@ def extract_prenom_before_docteur(text: str) -> str | None:
     return None
 
 
-def extract_technique(text: str, option: str = "lba") -> str | None:
+def numbered_spans(index: DocumentIndex, numbered_re, title_re, keys: tuple):
+    """(start, end) of the numbered section titles of the document.
+
+    A number is followed by whitespace or "+" up to the title, so numbered
+    titles are only tried just before the run of those characters that
+    precedes each title.
+    """
+    text = index.text
+    starts = set()
+    for start, _end in index.spans(title_re, keys):
+        while start and (text[start - 1].isspace() or text[start - 1] == "+"):
+            start -= 1
+        starts.update(start - length for length in NUMBER_LENGTHS)
+    spans = []
+    for start in sorted(starts):
+        match = numbered_re.match(text, start) if start >= 0 else None
+        if match:
+            spans.append((start, match.end()))
+    return spans
+
+
+def section_match(
+    index: DocumentIndex, spans: list, tail_re, other_section=None, cased=False
+):
+    """First match of tail_re (a "Technique :" pattern) in a section.
+
+    spans are the (start, end) of the section titles. Same match as
+    searching a title, then lazily up to SECTION_WINDOW characters, none of
+    them starting other_section, then tail_re, i.e. a
+    "BTB(?:(?!LAVAGE)[\s\S]){0,3000}?Technique..." pattern. The candidates
+    are taken from the positions of the index instead of scanning the
+    window: "Technique" words after the title, up to the window end or the
+    next occurrence of other_section (compared with case if cased).
+    """
+    techniques = index.positions("technique")
+    others = index.positions(other_section, cased) if other_section else []
+    for _start, end in spans:
+        limit = end + SECTION_WINDOW
+        next_other = index.first_after(others, end)
+        if next_other is not None:
+            limit = min(limit, next_other)
+        for position in index.between(techniques, end, limit):
+            match = tail_re.match(index.text, position)
+            if match:
+                return match
+    return None
+
+
+def extract_technique(
+    text: str, option: str = "lba", index: DocumentIndex | None = None
+) -> str | None:
     """Extract the medical technique (BTB or LBA) from text with multi-level fallback."""
-    if option.lower() == "btb":
-        technique_pattern = r"(2\.|II\.|I\.|2/|2°/)[\s+]*(Biopsies\s+trans[ -]*bronchiques|Biopsies\s+transbronchiques|Biospies\s+transbronchiques|BTB)(?:(?!LAVAGE)[\s\S]){0,3000}?Technique[^\S\r\n]*:[^\S\r\n]*([^;]+)"
-        fallback_technique_pattern = r"(Biopsies\s+trans[ -]*bronchiques|Biopsies\s+transbronchiques|Biospies\s+transbronchiques|BTB)(?:(?!LAVAGE)[\s\S]){0,3000}?Technique\s*:\s*([^;]+)"
-        fallback_technique_mention = "HES"
-    elif option.lower() == "lba":
-        technique_pattern = r"(1\.|I\.|I\.|1/|1°/)[\s+]*(Lavage\s+bronchoalvéolaire|Lavage\s+broncho-alvéolaire|LBA)(?:(?!BIOPSIE)[\s\S]){0,3000}?Technique[^\S\r\n]*:[^\S\r\n]*([^;]+)"
-        fallback_technique_pattern = r"(Lavage\s+bronchoalvéolaire|Lavage\s+broncho-alvéolaire|LBA)(?:(?!BIOPSIE)[\s\S]){0,3000}?Technique\s*:\s*([^;]+)"
-        fallback_technique_mention = "cytocentrifugation"
-    else:
+    sections = TECHNIQUE_SECTIONS.get(option.lower())
+    if sections is None:
         raise ValueError("Invalid option. Choose 'btb' or 'lba'.")
+    numbered_re, title_re, title_keys, other_section, mention = sections
+    if index is None:
+        index = DocumentIndex(text)
 
-    technique_match = re.search(technique_pattern, text, re.DOTALL | re.IGNORECASE)
+    numbered = numbered_spans(index, numbered_re, title_re, title_keys)
+    technique_match = section_match(index, numbered, TECHNIQUE_LINE_RE, other_section)
     if technique_match:
-        return technique_match.group(3).strip()
+        return technique_match.group(1).strip()
 
-    fallback_match = re.search(
-        fallback_technique_pattern, text, re.DOTALL | re.IGNORECASE
-    )
+    titles = index.spans(title_re, title_keys)
+    fallback_match = section_match(index, titles, TECHNIQUE_ANY_RE, other_section)
     if fallback_match:
-        return fallback_match.group(2).strip()
+        return fallback_match.group(1).strip()
 
-    if fallback_technique_mention.lower() in text.lower():
-        return fallback_technique_mention
+    if mention.lower() in text.lower():
+        return mention
 
-    technique_search_pattern = r"Technique\s*:\s*([^;]+)"
-    technique_matches = re.findall(
-        technique_search_pattern, text, re.IGNORECASE | re.DOTALL
-    )
-    if technique_matches:
-        return technique_matches[0].strip()
+    any_match = index.find(TECHNIQUE_ANY_RE, TECHNIQUE_KEYS)
+    if any_match:
+        return any_match.group(1).strip()
 
-    last_fallback_pattern = r"Technique\s*:\s*([^;]+)"
-    last_fallback_match = re.search(last_fallback_pattern, text, re.DOTALL)
+    last_fallback_match = index.find(TECHNIQUE_CASED_RE, TECHNIQUE_KEYS)
     if last_fallback_match:
         return last_fallback_match.group(1).strip()
 
     return None
 
 
-def extract_niveaux_coupes(text: str) -> str | None:
+def extract_niveaux_coupes(
+    text: str, index: DocumentIndex | None = None
+) -> str | None:
     """Extract the levels of cuts (niveaux de coupes) with multi-level fallback."""
+    if index is None:
+        index = DocumentIndex(text)
+
     # Direct: "X niveaux de coupes" after "Technique : HES ;"
-    direct_pattern = r"Technique\s*:\s*HES\s*;\s*(\d+)\s*niveaux?\s*de\s*coupes?"
-    direct_match = re.search(direct_pattern, text, re.IGNORECASE)
+    direct_match = index.find(NIVEAUX_DIRECT_RE, TECHNIQUE_KEYS)
     if direct_match:
         return direct_match.group(1).strip()
 
     # Alt: "X niveaux de coupes" anywhere
-    alt_pattern = r"(\d+)\s*niveaux?\s*de\s*coupes?"
-    alt_match = re.search(alt_pattern, text, re.IGNORECASE)
+    alt_match = NIVEAUX_ANY_RE.search(text)
     if alt_match:
         return alt_match.group(1).strip()
 
     # Numbered section pattern
-    pattern = r"(2\.|II\.|I\.|2/|2°/)[\s+]*(Biopsies\s+trans[ -]*bronchiques|Biopsies\s+transbronchiques|Biospies\s+transbronchiques|BTB)[\s\S]{0,3000}?Technique\s*:\s*([^;]+);\s*([^n]+)"
-    match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+    numbered = numbered_spans(index, BTB_NUMBERED_RE, BTB_TITLE_RE, BTB_TITLE_KEYS)
+    match = section_match(index, numbered, TECHNIQUE_TWO_PARTS_ANY_RE)
     if match:
-        return match.group(4).strip()
+        return match.group(2).strip()
 
     # Unnumbered section fallback
-    fallback_pattern = r"(Biopsies\s+trans[ -]*bronchiques|Biopsies\s+transbronchiques|Biospies\s+transbronchiques|BTB)(?:(?!LAVAGE)[\s\S]){0,3000}?Technique\s*:\s*([^;]+);\s*([^n]+)"
-    fallback_match = re.search(fallback_pattern, text, re.DOTALL)
+    titles = index.spans(BTB_CASED_TITLE_RE, BTB_TITLE_KEYS)
+    fallback_match = section_match(
+        index, titles, TECHNIQUE_TWO_PARTS_RE, "LAVAGE", cased=True
+    )
     if fallback_match:
-        return fallback_match.group(3).strip()
+        return fallback_match.group(2).strip()
 
     if "HES" in text:
         return None
 
-    # Split by "Technique:" sections
-    parts = re.split(r"(?=Technique\s*:)", text, flags=re.IGNORECASE)
-    if len(parts) > 2:
-        two_parts_pattern = r"Technique\s*:\s*([^;]+);\s*([^n]+)"
-        two_parts_match = re.search(two_parts_pattern, parts[-1], re.DOTALL)
+    # Last "Technique:" section, if there are several
+    starts = [
+        position
+        for position in index.positions("technique")
+        if TECHNIQUE_COLON_RE.match(text, position)
+    ]
+    if len(starts) > 1:
+        two_parts_match = index.find(TECHNIQUE_TWO_PARTS_RE, TECHNIQUE_KEYS, starts[-1])
         if two_parts_match:
             return two_parts_match.group(2).strip()
 
     # Last fallback
-    last_pattern = r"Technique\s*:\s*([^;]+);\s*([^n]+)"
-    last_match = re.search(last_pattern, text, re.DOTALL)
+    last_match = index.find(TECHNIQUE_TWO_PARTS_RE, TECHNIQUE_KEYS)
     if last_match:
         return last_match.group(2).strip()
 
     return None
 
 
-def detect_modele_btb(text: str, date_prelevement: str | None = None) -> str:
+def detect_modele_btb(
+    text: str,
+    date_prelevement: str | None = None,
+    index: DocumentIndex | None = None,
+) -> str:
     """Detect whether a BTB document is free-text or semi-structured."""
     if date_prelevement:
         try:
@@ -164,23 +372,13 @@ def detect_modele_btb(text: str, date_prelevement: str | None = None) -> str:
         except (ValueError, TypeError):
             pass
 
-    structured_patterns = [
-        r"Site\s*:",
-        r"Infiltrat\s*mononucléé",
-        r"Bronchiolite\s*lymphocytaire",
-        r"Nombre\s*de\s*fragments?\s*alvéolaires?",
-        r"Rejet\s*cellulaire\s*:",
-        r"Rejet\s*chronique\s*:",
-        r"Atteinte\s*du\s*compartiment",
-        r"PNN\s*dans\s*les\s*cloisons",
-        r"Bronchiolite\s*oblitérante\s*\(",
-    ]
-
+    if index is None:
+        index = DocumentIndex(text)
     structured_count = sum(
-        1 for p in structured_patterns if re.search(p, text, re.IGNORECASE)
+        1 for keys, p in STRUCTURED_PATTERNS if index.find(p, keys)
     )
 
-    if structured_count >= 3:
+    if structured_count >= STRUCTURED_MIN:
         return "semi_structure"
     return "texte_libre"
 
@@ -188,37 +386,40 @@ def detect_modele_btb(text: str, date_prelevement: str | None = None) -> str:
 def extract_texte_libre_complet(text: str, modele_btb: str) -> str | None:
     """Return the full text if the document is free-text, None otherwise."""
     if modele_btb == "texte_libre":
-        cleaned_text = re.sub(r"[ \t]+", " ", text)
-        cleaned_text = re.sub(r"\n\s*\n", "\n\n", cleaned_text)
+        cleaned_text = HORIZONTAL_SPACE_RE.sub(" ", text)
+        cleaned_text = BLANK_LINES_RE.sub("\n\n", cleaned_text)
         return cleaned_text.strip()
     return None
 
 
-def extract_information(text: str, patterns: list[dict]) -> dict:
-    """Extract information from text based on a list of regex pattern definitions."""
-    results = {}
-    for item in patterns:
-        field = item["field"]
-        pattern = item["pattern"]
-        group_index = item.get("group_index")
+def extract_information(
+    text: str, patterns, index: DocumentIndex | None = None
+) -> dict:
+    """Extract fields from text with compiled pattern definitions.
 
-        try:
-            match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-            if match:
-                if field == "Nom" and len(match.groups()) >= 4:
-                    part3 = match.group(3) or ""
-                    part4 = match.group(4) or ""
-                    results[field] = (part3 + part4).strip()
-                else:
-                    if group_index and group_index <= len(match.groups()):
-                        results[field] = match.group(group_index).strip()
-                    else:
-                        results[field] = None
-            else:
-                results[field] = None
-        except (re.error, IndexError) as e:
-            log.warning("Pattern error for field '%s': %s", field, e)
+    patterns is a registry from patterns.compile_patterns (e.g.
+    PATTERN_REGISTRY); a list of raw definitions is compiled first.
+
+    Fields are resolved from the document index (see document_index), which
+    gives the same matches as searching each pattern over the whole text.
+    index may be passed to share it with the other extractors.
+    """
+    if not isinstance(patterns, dict):
+        patterns = compile_patterns(patterns)
+    if index is None:
+        index = DocumentIndex(text)
+    results = {}
+    for field, item in patterns.items():
+        regex = item["regex"]
+        match = index.search(item)
+        if not match:
             results[field] = None
+        elif field == "Nom" and regex.groups >= 4:
+            part3 = match.group(3) or ""
+            part4 = match.group(4) or ""
+            results[field] = (part3 + part4).strip()
+        else:
+            results[field] = match.group(item["group_index"]).strip()
 
     return results
 
@@ -226,5 +427,5 @@ def extract_information(text: str, patterns: list[dict]) -> dict:
 def remove_illegal_chars(s):
     """Remove Excel-illegal control characters from a string."""
     if isinstance(s, str):
-        return re.sub(r"[\x00-\x1F\x7F]", "", s)
+        return ILLEGAL_CHARS_RE.sub("", s)
     return s
@@ -4,34 +4,56 @@ Each pattern dict has:
     field       -- column name in the output DataFrame
     pattern     -- regex pattern string
     group_index -- which capture group contains the value
+    keys        -- optional, case-folded words; every match of the pattern
+                   must start with one of them (the first word of the
+                   field's label), document_index tries it only there
+    anchors     -- optional, case-folded words of which every match contains
+                   at least one; documents with none of them skip the
+                   pattern (defaults to the keys)
+
+The patterns are compiled once at import (PATTERN_REGISTRY, keyed by field,
+with FLAGS); an invalid regex, group_index, key or anchor fails here rather
+than on every document.
 """
 
+import re
+
+from src.structuration.document_index import fold
+
+# Flags of every field pattern
+FLAGS = re.DOTALL | re.IGNORECASE
+
 # -- Patient identification patterns ------------------------------------------
 PATIENT_PATTERNS = [
     {
         "field": "Nom",
-        "pattern": r"(?i)((?<!Pré)Nom\s*:\s*|Nom[\s+]*usuel\s*:\s*)(?:Mme\s+)?(([A-Z]+)([\s]*(?:\s*(Pr))?[A-Z]*))(?:\s*(Destinataire))?",
+        "pattern": r"(?i)((?<!Pré)Nom\s*:\s*|Nom[\s+]*usuel\s*:\s*)(?:Mme\s+)?(([A-Z]+)(\s*(?:\s*(Pr))?[A-Z]*))(?:\s*(Destinataire))?",
         "group_index": 3,
+        "keys": ("nom",),
     },
     {
         "field": "Date de naissance",
         "pattern": r"(?i)(Date[\s+]*de[\s+]*naissance\s*:\s*)(\d{2}/\d{2}/\d{4})",
         "group_index": 2,
+        "keys": ("date",),
     },
     {
         "field": "Biopsy ID",
         "pattern": r"((N°\s+de\s+demande\s+:\s+)|(N°\s+P\s+)|(N°\s+S\s+))(\w+-\w+|\w+.\w+)",
         "group_index": 5,
+        "keys": ("n°",),
     },
     {
         "field": "Sexe",
         "pattern": r"Sexe\s*:\s*([MF])",
         "group_index": 1,
+        "keys": ("sexe",),
     },
     {
         "field": "Date de prélèvement",
-        "pattern": r"(?i)(Prélevé[\s\xa0]*le[\s\xa0]*[\s\xa0]*:[\s\xa0\D]*)(\d{2}/\d{2}/\d{4})",
+        "pattern": r"(?i)(Prélevé\s*le\s*:\D*)(\d{2}/\d{2}/\d{4})",
         "group_index": 2,
+        "keys": ("prélevé",),
     },
     # Prescripteur is handled by extract_prescripteur() in extractors.py
     # to avoid catastrophic regex backtracking.
@@ -41,162 +63,199 @@ PATIENT_PATTERNS = [
 BTB_PATTERNS = [
     {
         "field": "Site",
-        "pattern": r"(Site[\s\xa0]*:)([\S]*[^\n]+)",
+        "pattern": r"(Site\s*:)(\S*[^\n]+)",
         "group_index": 2,
+        "keys": ("site",),
     },
     {
         "field": "Nombre de fragment alvéolaire",
-        "pattern": r"(Nombre[\s\xa0]*de[\s\xa0]*fragments[\s\xa0]*alvéolaires[\s\xa0]*:|Nombre[\s\xa0]*de[\s\xa0]*fragments[\s\xa0]*de[\s\xa0]*tissu(s)?[\s\xa0]*alvéolaire(s)?[\s\xa0]*:)([\S]*[^\n]+)",
+        "pattern": r"(Nombre\s*de\s*fragments\s*alvéolaires\s*:|Nombre\s*de\s*fragments\s*de\s*tissu(s)?\s*alvéolaire(s)?\s*:)(\S*[^\n]+)",
         "group_index": 4,
+        "keys": ("nombre",),
     },
     {
         "field": "Bronches/Bronchioles",
-        "pattern": r"(Bronches\/Bronchioles[\s\xa0]*:[\s\xa0]*|Bronches[\s\xa0]*\/[\s\xa0]*Bronchioles[\s\xa0]*:[\s\xa0]*)([\S]*[^\n]+)",
+        "pattern": r"(Bronches/Bronchioles\s*:\s*|Bronches\s*/\s*Bronchioles\s*:\s*)(\S*[^\n]+)",
         "group_index": 2,
+        "keys": ("bronches",),
     },
     {
         "field": "Infiltrat",
-        "pattern": r"(Infiltrat[\s\xa0]*mononucléé[\s\xa0]*péri(?:-|\s*)?vasculaire[\s\xa0]*\(A0[\s\xa0]*à[\s\xa0]*A4[\s\xa0]*\/[\s\xa0]*AX\)[\s\xa0]*:*:[\s\xa0]*|Infiltrat[\s\xa0]*mononucléé[\s\xa0]*péri(?:-|\s*)?vasculaire[\s\xa0]*\(A[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n]+)",
+        "pattern": r"(Infiltrat\s*mononucléé\s*péri(?:-|\s*)vasculaire\s*\(A0\s*à\s*A4\s*/\s*AX\)\s*:+\s*|Infiltrat\s*mononucléé\s*péri(?:-|\s*)vasculaire\s*\(A\s*\)\s*:+\s*)(\S*[^\n]+)",
         "group_index": 2,
+        "keys": ("infiltrat",),
+        "anchors": ("mononucléé",),
     },
     {
         "field": "Bronchiolite Lymphocytaire",
-        "pattern": r"(Bronchiolite[\s\xa0]*lymphocytaire[\s\xa0]*\(B0[\s\xa0]*\/[\s\xa0]*1R[\s\xa0]*\/[\s\xa0]*2R[\s\xa0]*\/[\s\xa0]*BX\)[\s\xa0]*:*:[\s\xa0]*|Bronchiolite[\s\xa0]*lymphocytaire[\s\xa0]*\(B[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\w]*)",
+        "pattern": r"(Bronchiolite\s*lymphocytaire\s*\(B0\s*/\s*1R\s*/\s*2R\s*/\s*BX\)\s*:+\s*|Bronchiolite\s*lymphocytaire\s*\(B\s*\)\s*:+\s*)(\w*)",
         "group_index": 2,
+        "keys": ("bronchiolite",),
+        "anchors": ("lymphocytaire",),
     },
     {
         "field": "Inflammation Lymphocytaire",
-        "pattern": r"(Inflammation[\s\xa0]*lymphocytaire[\s\xa0]*bronchique[\s\xa0]*\([\s\xa0]*oui[\s\xa0]*\/[\s\xa0]*non[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\w]*)",
+        "pattern": r"(Inflammation\s*lymphocytaire\s*bronchique\s*\(\s*oui\s*/\s*non\s*\)\s*:+\s*)(\w*)",
         "group_index": 2,
+        "keys": ("inflammation",),
     },
     {
         "field": "Bronchiolite oblitérante",
-        "pattern": r"Bronchiolite[\s\xa0]*(oblitérante|constrictive)(?:[\s\xa0]*\((0[\s\xa0]*ou[\s\xa0]*1)\))?[\s\xa0]*:[\s\xa0]*(\w)",
+        "pattern": r"Bronchiolite\s*(oblitérante|constrictive)(?:\s*\((0\s*ou\s*1)\))?\s*:\s*(\w)",
         "group_index": 3,
+        "keys": ("bronchiolite",),
+        "anchors": ("oblitérante", "constrictive"),
     },
     {
         "field": "Fibro-élastose interstitielle",
-        "pattern": r"(Fibro(?:-|\s*)?élastose[\s\xa0]*interstitielle [\s\xa0]*\([\s\xa0]*0[\s\xa0]*ou[\s\xa0]*1[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\w]*)",
+        "pattern": r"(Fibro(?:-|\s*)élastose\s*interstitielle \s*\(\s*0\s*ou\s*1\s*\)\s*:+\s*)(\w*)",
         "group_index": 2,
+        "keys": ("fibro",),
+        "anchors": ("élastose",),
     },
     {
         "field": "PNN dans les cloisons alvéolaires",
-        "pattern": r"((PNN[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*capillaires[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*|PNN[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*cloisons[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([^\n]+))",
+        "pattern": r"((PNN\s*dans\s*les\s*capillaires\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*|PNN\s*dans\s*les\s*cloisons\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)([^\n]+))",
         "group_index": 3,
+        "keys": ("pnn",),
     },
     {
         "field": "Cellules mononucléées",
-        "pattern": r"(Cellules[\s\xa0]*mononucléées[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*capillaires[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*|Cellules[\s\xa0]*mononuclées[\s\xa0]*\(lymphocytes[\s\xa0]*ou[\s\xa0]*macrophages[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*cloisons[\s\xa0]*alvéolaires\)[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n]+)",
+        "pattern": r"(Cellules\s*mononucléées\s*dans\s*les\s*capillaires\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*|Cellules\s*mononuclées\s*\(lymphocytes\s*ou\s*macrophages\s*dans\s*les\s*cloisons\s*alvéolaires\)\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n]+)",
         "group_index": 2,
+        "keys": ("cellules",),
+        "anchors": ("mononucl",),
     },
     {
         "field": "Dilatation des capillaires alvéolaires",
-        "pattern": r"(Dilatation[\s\xa0]*des[\s\xa0]*capillaires[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n]+)",
+        "pattern": r"(Dilatation\s*des\s*capillaires\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n]+)",
         "group_index": 2,
+        "keys": ("dilatation",),
     },
     {
         "field": "Œdème des cloisons alvéolaires",
-        "pattern": r"((Œdème|Oedème)[\s\xa0]*des[\s\xa0]*cloisons[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"((Œdème|Oedème)\s*des\s*cloisons\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 3,
+        "keys": ("œdème", "oedème"),
     },
     {
         "field": "Thrombi fibrineux dans les capillaires alvéolaires",
-        "pattern": r"(Thrombi[\s\xa0]*fibrineux[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*capillaires[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Thrombi\s*fibrineux\s*dans\s*les\s*capillaires\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("thrombi",),
     },
     {
         "field": "Débris cellulaires dans les cloisons alvéolaires",
-        "pattern": r"(Débris[\s\xa0]*cellulaires[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*cloisons[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Débris\s*cellulaires\s*dans\s*les\s*cloisons\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("débris",),
     },
     {
         "field": "Epaississement fibreux des cloisons alvéolaires",
-        "pattern": r"(Epaississement[\s\xa0]*fibreux[\s\xa0]*des[\s\xa0]*cloisons[\s\xa0]*alvéolaires[\s\xa0]*(?:\w*)?\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Epaississement\s*fibreux\s*des\s*cloisons\s*alvéolaires\s*(?:\w*)?\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("epaississement",),
     },
     {
         "field": "Hyperplasie pneumocytaire",
-        "pattern": r"(Hyperplasie[\s\xa0]*pneumocytaire[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Hyperplasie\s*pneumocytaire\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("hyperplasie",),
     },
     {
         "field": "PNN dans les espaces alvéolaires",
-        "pattern": r"(PNN[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*espaces[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*|PNN[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*espaces[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([^\n]+)",
+        "pattern": r"(PNN\s*dans\s*les\s*espaces\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*|PNN\s*dans\s*les\s*espaces\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)([^\n]+)",
         "group_index": 2,
+        "keys": ("pnn",),
     },
     {
         "field": "Macrophages dans les espaces alvéolaires",
-        "pattern": r"(Macrophages[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*espaces[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Macrophages\s*dans\s*les\s*espaces\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("macrophages",),
     },
     {
         "field": "Bourgeons conjonctifs dans les espaces alvéolaires",
-        "pattern": r"(Bourgeons[\s\xa0]*conjonctifs[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*espaces[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Bourgeons\s*conjonctifs\s*dans\s*les\s*espaces\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("bourgeons",),
     },
     {
         "field": "Hématies dans les espaces alvéolaires",
-        "pattern": r"(Hématies[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*espaces[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Hématies\s*dans\s*les\s*espaces\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("hématies",),
     },
     {
         "field": "Membranes hyalines",
-        "pattern": r"(Membranes[\s\xa0]*hyalines[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Membranes\s*hyalines\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("membranes",),
     },
     {
         "field": "Fibrine dans les espaces alvéolaires",
-        "pattern": r"(Fibrine[\s\xa0]*dans[\s\xa0]*les[\s\xa0]*espaces[\s\xa0]*alvéolaires[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Fibrine\s*dans\s*les\s*espaces\s*alvéolaires\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("fibrine",),
     },
     {
         "field": "Inflammation sous-pleurale, septale, bronchique ou bronchiolaire",
-        "pattern": r"(Inflammation[\s\xa0]*sous(\-|[\s\xa0])?pleurale,[\s\xa0]*septale,[\s\xa0]*bronchique[\s\xa0]*ou[\s\xa0]*bronchiolaire[\s\xa0]*\(0[\s\xa0]*à[\s\xa0]*\+\+\+[\s\xa0]*\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Inflammation\s*sous(\-|\s)?pleurale,\s*septale,\s*bronchique\s*ou\s*bronchiolaire\s*\(0\s*à\s*\+\+\+\s*\)\s*:+\s*)(\S*[^\n])",
         "group_index": 3,
+        "keys": ("inflammation",),
     },
     {
         "field": "BALT",
-        "pattern": r"(BALT[\s\xa0]*\(oui\/non\)[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(BALT\s*\(oui/non\)\s*:+\s*)(\S*[^\n])",
         "group_index": 2,
+        "keys": ("balt",),
     },
     {
         "field": "Thrombus fibrino-cruorique",
-        "pattern": r"(Thrombus[\s\xa0]*fibrino(\-|[\s\xa0]|)?cruorique[\s\xa0]*(\(oui\/non\)|)?[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Thrombus\s*fibrino(\-|\s|)?cruorique\s*(\(oui/non\)|)?\s*:+\s*)(\S*[^\n])",
         "group_index": 4,
+        "keys": ("thrombus",),
+        "anchors": ("cruorique",),
     },
     {
         "field": "Nécrose ischémique",
-        "pattern": r"(Nécrose[\s\xa0]*ischémique[\s\xa0]*(\(oui\/non\)|)?[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Nécrose\s*ischémique\s*(\(oui/non\)|)?\s*:+\s*)(\S*[^\n])",
         "group_index": 3,
+        "keys": ("nécrose",),
     },
     {
         "field": "Inclusions virales",
-        "pattern": r"(Inclusions[\s\xa0]*virales[\s\xa0]*(\(oui\/non\)|)?[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Inclusions\s*virales\s*(\(oui/non\)|)?\s*:+\s*)(\S*[^\n])",
         "group_index": 3,
+        "keys": ("inclusions",),
     },
     {
         "field": "Agent pathogène",
-        "pattern": r"(Agent[\s\xa0]*pathogène[\s\xa0]*(\(oui\/non\)|)?[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Agent\s*pathogène\s*(\(oui/non\)|)?\s*:+\s*)(\S*[^\n])",
         "group_index": 3,
+        "keys": ("agent",),
     },
     {
         "field": "Eosinophilie (interstitielle/alvéolaire)",
-        "pattern": r"(Eosinophilie[\s\xa0]*(\(interstitielle\/alvéolaire\)|)?[\s\xa0]*(\(oui\/non\)|)?[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Eosinophilie\s*(\(interstitielle/alvéolaire\)|)?\s*(\(oui/non\)|)?\s*:+\s*)(\S*[^\n])",
         "group_index": 4,
+        "keys": ("eosinophilie",),
     },
     {
         "field": "Remodelage vasculaire",
-        "pattern": r"(Remodelage[\s\xa0]*vasculaire[\s\xa0]*[\s\xa0]*(\(oui\/non\)|)?[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Remodelage\s*vasculaire\s*(\(oui/non\)|)?\s*:+\s*)(\S*[^\n])",
         "group_index": 3,
+        "keys": ("remodelage",),
     },
     {
         "field": "Matériel étranger d'inhalation",
-        "pattern": r"(Matériel[\s\xa0]*étranger[\s\xa0]*d'inhalation[\s\xa0]*(\(oui\/non\)|)?[\s\xa0]*:*:[\s\xa0]*)([\S]*[^\n])",
+        "pattern": r"(Matériel\s*étranger\s*d'inhalation\s*(\(oui/non\)|)?\s*:+\s*)(\S*[^\n])",
         "group_index": 3,
+        "keys": ("matériel",),
     },
     {
         "field": "Conclusion",
-        "pattern": r"((Conclusion|C[\s\xa0]O[\s\xa0]N[\s\xa0]C[\s\xa0]L[\s\xa0]U[\s\xa0]S[\s\xa0]I[\s\xa0]O[\s\xa0]N)[\s\xa0]*(:.*|))([\s\S]*)",
+        "pattern": r"((Conclusion|C\sO\sN\sC\sL\sU\sS\sI\sO\sN)\s*(:.*|))([\s\S]*)",
         "group_index": 4,
     },
 ]
@@ -204,6 +263,45 @@ BTB_PATTERNS = [
 # Combined list for the extraction pipeline
 ALL_PATTERNS = PATIENT_PATTERNS + BTB_PATTERNS
 
+
+def compile_patterns(patterns: list[dict]) -> dict[str, dict]:
+    """Compile pattern definitions, keyed by field.
+
+    Each entry is the definition plus "regex", the compiled pattern, "keys"
+    and "anchors" (the keys by default), as tuples. Raises ValueError for an
+    invalid regex, a group_index outside the pattern's groups, a key or
+    anchor that is not a single case-folded word or a duplicated field.
+    """
+    registry = {}
+    for item in patterns:
+        field = item["field"]
+        if field in registry:
+            raise ValueError(f"Duplicated pattern field '{field}'.")
+        try:
+            regex = re.compile(item["pattern"], FLAGS)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern for field '{field}': {e}") from e
+        group_index = item.get("group_index")
+        if not group_index or group_index > regex.groups:
+            raise ValueError(
+                f"Invalid group_index {group_index} for field '{field}' "
+                f"({regex.groups} groups)."
+            )
+        keys = tuple(item.get("keys", ()))
+        anchors = tuple(item.get("anchors", keys))
+        for kind, words in (("Key", keys), ("Anchor", anchors)):
+            for word in words:
+                if word.split() != [fold(word)]:
+                    raise ValueError(
+                        f"{kind} '{word}' of field '{field}' is not a "
+                        f"case-folded word."
+                    )
+        registry[field] = {**item, "regex": regex, "keys": keys, "anchors": anchors}
+    return registry
+
+
+PATTERN_REGISTRY = compile_patterns(ALL_PATTERNS)
+
 # -- Column ordering for output Excel -----------------------------------------
 COLUMN_ORDER = [
     "Filename",